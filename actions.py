@@ -1,20 +1,54 @@
-import datetime
+import hashlib
 import os
 import shutil
 import sys
+import time
 from datetime import date
 from enum import Enum
 
-import yaml
-from functional import seq
-from PyInquirer import Separator, prompt
-
 import constants
+from catalog import directorySize, recordDump, refreshCatalog, updateDump
+from checkpoints import Checkpoint, CheckpointStore, isUnchanged
+from chunks import chunkStoreSize, collectGarbage, readManifest
+from commands import (COMPRESSION_TYPES, DOCKER_TRANSPORTS, DUMP_FORMATS,
+                      MANIFEST_FILE, STORAGE_TYPES, baseDumpCommand, clientEnv,
+                      compressionOf, containerPath, dockerCopyFromCommand,
+                      dockerCopyToCommand, dockerExec, dockerRemoveCommand,
+                      dumpCommand, dumpExtension, dumpFormatOf, dumpJobs,
+                      mountedDumpCommand, mountedPath, mountedRestoreCommand,
+                      pgDumpCommand, pgRestoreCommand,
+                      recreateDatabaseCommands, subsetDumpCommand)
+from configstore import ConfigStore
 from constants import BColors
+from digests import compareDigests, dumpDigests, isComparable
+from formatting import formatDate, formatDuration, formatSeconds, formatSize
+from history import (describeOperation, historyFile, operationStatistics,
+                     readHistory, recordOperation, recorded)
+from incremental import (advanceSlot, binlogPosition, chainHead, createSlot,
+                         dropSlot, dumpChain, dumpIncrement, slotName)
+from jobs import FINISHED_STATUSES, WORKER_LOG_FILE, JobStore
+from parallel import (dumpTables, readTablesManifest, remainingTablesSize,
+                      restoreTables)
+from pipeline import dumpToChunks, dumpToFile, restoreFromFile, runPipeline
+from progress import Progress
+from scheduler import hostKey, isSameServer, runPerHost
+from snapshots import (createSnapshot, getSnapshot, removeSnapshot,
+                       restoreSnapshot, unsupportedObjects)
+from tableindex import (isIndexable, loadIndex, removeIndex, restoreRanges,
+                        restoreSize)
+from transfer import copyDatabase, copyExtension
+
 
+def prompt(questions, style=None):
+    # PyInquirer pulls in the whole prompt_toolkit stack, it is only imported once a question is actually asked
+    from PyInquirer import Token, style_from_dict
+    from PyInquirer import prompt as inquirerPrompt
+    if style is not None:
+        style = style_from_dict({getattr(Token, name): value for name, value in style.items()})
+    return inquirerPrompt(questions, style=style)
 
 class Config:
-    def __init__(self, config_id, database, dumpFolder, databaseUser, databasePassword, databaseType='mysql', isDocker=False, dockerContainerName=None, dockerPort=None):
+    def __init__(self, config_id, database, dumpFolder, databaseUser, databasePassword, databaseType='mysql', isDocker=False, dockerContainerName=None, dockerPort=None, compression='none', compressionLevel=None, compressionThreads=None, dumpFormat='plain', dumpJobs=None, fastRestore=False, storage='files', dockerTransport='exec', dockerDumpFolder=None, subsetTables=None, subsetSchemaOnly=None, incrementalDumps=False, checkpointRestores=False):
         self.config_id = config_id
         self.database = database
         self.dumpFolder = dumpFolder
@@ -24,10 +58,36 @@ class Config:
         self.isDocker = isDocker
         self.dockerContainerName = dockerContainerName
         self.dockerPort = dockerPort
+        self.compression = compression
+        self.compressionLevel = compressionLevel
+        self.compressionThreads = compressionThreads
+        self.dumpFormat = dumpFormat
+        self.dumpJobs = dumpJobs
+        self.fastRestore = fastRestore
+        self.storage = storage
+        self.dockerTransport = dockerTransport
+        self.dockerDumpFolder = dockerDumpFolder
+        self.subsetTables = subsetTables
+        self.subsetSchemaOnly = subsetSchemaOnly
+        self.incrementalDumps = incrementalDumps
+        self.checkpointRestores = checkpointRestores
+
+DUMP_SORTS = {
+    'Newest first': (lambda dump: dump['created'], True),
+    'Oldest first': (lambda dump: dump['created'], False),
+    'Largest first': (lambda dump: dump['size'], True),
+    'Name': (lambda dump: dump['name'], False)
+}
+CONFIG_STORE = None
+NEXT_PAGE = '__next_page__'
+PREVIOUS_PAGE = '__previous_page__'
+FILTER_DUMPS = '__filter_dumps__'
+SORT_DUMPS = '__sort_dumps__'
 
 class ChoiceGroups(Enum):
 
     DATABASE_ACTIONS = 'Database actions'
+    JOBS = 'Background jobs'
     CONFIG_ACTIONS = 'Configuration actions'
     OTHER = 'Other'
 
@@ -37,9 +97,22 @@ class ChoiceGroups(Enum):
 class Choices(Enum):
 
     RESTORE_DUMP = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Restore a dump', lambda config: restoreDump(config)
+    RESTORE_TABLES = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Restore tables from a dump', lambda config: restoreDumpTables(config)
+    RESUME_RESTORE = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Resume an interrupted restore', lambda config: resumeRestore(config)
     CREATE_DUMP = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Create a dump from ' + config.database, lambda config: createDump(config)
+    DUMP_CONFIGURATIONS = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Create a dump of all or selected configurations', lambda config: dumpConfigurations()
+    COPY_DATABASE = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Copy ' + config.database + ' to another configuration', lambda config: copyToConfiguration(config)
     CLEAN_DB = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Make ' + config.database + ' empty.', lambda config: cleanDatabase(config)
     LIST_DUMPS = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'List all dumps in ' + config.dumpFolder, lambda config: listDumps(config)
+    COMPARE_DUMPS = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Compare two dumps', lambda config: compareDumps(config)
+    SNAPSHOT_DUMP = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Snapshot a dump for near-instant restores', lambda config: snapshotDump(config)
+    REMOVE_SNAPSHOT = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Remove the snapshot of a dump', lambda config: removeDumpSnapshot(config)
+    REMOVE_UNUSED_CHUNKS = ChoiceGroups.DATABASE_ACTIONS, lambda config: 'Remove unused chunks of deduplicated dumps', lambda config: removeUnusedChunks(config)
+    BACKGROUND_DUMP = ChoiceGroups.JOBS, lambda config: 'Create a dump from ' + config.database + ' in the background', lambda config: submitDumpJob(config)
+    BACKGROUND_RESTORE = ChoiceGroups.JOBS, lambda config: 'Restore a dump in the background', lambda config: submitRestoreJob(config)
+    BACKGROUND_CLEAN = ChoiceGroups.JOBS, lambda config: 'Make ' + config.database + ' empty in the background', lambda config: submitCleanJob(config)
+    SHOW_JOBS = ChoiceGroups.JOBS, lambda config: 'Show jobs', lambda config: showJobs()
+    CANCEL_JOB = ChoiceGroups.JOBS, lambda config: 'Cancel a job', lambda config: cancelJob()
     INIT_CONFIG = ChoiceGroups.CONFIG_ACTIONS, lambda config: 'Initialize the configuration file', lambda config: initConfig()
     CHANGE_CONFIG = ChoiceGroups.CONFIG_ACTIONS, lambda config: 'Change the current configuration', lambda config: changeConfig()
     SHOW_CONFIG = ChoiceGroups.CONFIG_ACTIONS, lambda config: 'Show all configurations', lambda config: showAllConfig()
@@ -47,6 +120,7 @@ class Choices(Enum):
     ADD_CONFIG = ChoiceGroups.CONFIG_ACTIONS, lambda config: 'Add a configuration', lambda config: addConfig()
     EDIT_CONFIG = ChoiceGroups.CONFIG_ACTIONS, lambda config: 'Edit a configuration', lambda config: editConfig()
     REMOVE_CONFIG = ChoiceGroups.CONFIG_ACTIONS, lambda config: 'Remove a configuration', lambda config: removeConfig(config)
+    SHOW_STATISTICS = ChoiceGroups.OTHER, lambda config: 'Show statistics of past operations', lambda config: showStatistics()
     EXIT = ChoiceGroups.OTHER, lambda config: 'Exit', lambda config: exit()
 
     def __init__(self, group, title, function):
@@ -56,6 +130,8 @@ class Choices(Enum):
 
     @staticmethod
     def objects(config):
+        from functional import seq
+        from PyInquirer import Separator
         grouped_choices = seq(Choices) \
             .group_by(lambda c: c.group)
         questions = []
@@ -78,17 +154,47 @@ def getConfigFilePath():
     current_dir = os.path.dirname(sys.argv[0])
     return os.path.join(current_dir, 'config.yml')
 
+def configStore():
+    global CONFIG_STORE
+    config_file_path = getConfigFilePath()
+    if CONFIG_STORE is None or CONFIG_STORE.path != config_file_path:
+        CONFIG_STORE = ConfigStore(config_file_path, configFromDict)
+    return CONFIG_STORE
+
+def configFileExists():
+    config_file_path = getConfigFilePath()
+    if not os.path.exists(config_file_path):
+        logError("Configuration file '%s' does not exist, run jdump without arguments to initialize it" % config_file_path)
+        return False
+    return True
+
+def getConfig(config_id=None):
+    if not configFileExists():
+        return None
+    import yaml
+    config_file_path = getConfigFilePath()
+    try:
+        configs = configStore().configs()
+    except yaml.YAMLError as exc:
+        logError(str(exc))
+        return None
+    config_id = config_id or configs.get(constants.configToUseVarName)
+    if config_id is None or config_id == constants.configToUseVarName or config_id not in configs:
+        logError('Could not find config ' + str(config_id) + ' in ' + config_file_path)
+        return None
+    return extractConfigToUse(config_id, configs)
+
 def loadConfig():
+    import yaml
     config_file_path = getConfigFilePath()
     if not os.path.exists(config_file_path):
         initConfig()
-    with open(getConfigFilePath(), 'r') as stream:
-        try:
-            configs=yaml.safe_load(stream)
-            configToUse=configs.get(constants.configToUseVarName)
-            return extractConfigToUse(configToUse, configs)
-        except yaml.YAMLError as exc:
-            logError(str(exc))
+    try:
+        configs=configStore().configs()
+        configToUse=configs.get(constants.configToUseVarName)
+        return extractConfigToUse(configToUse, configs)
+    except yaml.YAMLError as exc:
+        logError(str(exc))
 
 def extractConfigToUse(configToUse, configs):
     if configToUse is None:
@@ -96,19 +202,36 @@ def extractConfigToUse(configToUse, configs):
         changeConfig()
         return loadConfig()
     if configToUse not in configs:
+        from functional import seq
         logError('Could not find config ' + str(configToUse) + ' in configurations: ' + str(seq(configs.keys()).filter(lambda key: key != constants.configToUseVarName)))
         changeConfig()
         return loadConfig()
+    return configStore().configObject(configToUse)
+
+def configFromDict(key, values):
     return Config(
-        configToUse,
-        configs[configToUse]['database'], 
-        configs[configToUse]['dumpFolder'], 
-        configs[configToUse]['databaseUser'], 
-        configs[configToUse]['databasePassword'],
-        configs[configToUse].get('databaseType', 'mysql'),
-        configs[configToUse].get('isDocker', False),
-        configs[configToUse].get('dockerContainerName', None),
-        configs[configToUse].get('dockerPort', None)
+        key,
+        values['database'],
+        values['dumpFolder'],
+        values['databaseUser'],
+        values['databasePassword'],
+        values.get('databaseType', 'mysql'),
+        values.get('isDocker', False),
+        values.get('dockerContainerName', None),
+        values.get('dockerPort', None),
+        values.get('compression', 'none'),
+        values.get('compressionLevel', None),
+        values.get('compressionThreads', None),
+        values.get('dumpFormat', 'plain'),
+        values.get('dumpJobs', None),
+        values.get('fastRestore', False),
+        values.get('storage', 'files'),
+        values.get('dockerTransport', 'exec'),
+        values.get('dockerDumpFolder', None),
+        values.get('subsetTables', None),
+        values.get('subsetSchemaOnly', None),
+        values.get('incrementalDumps', False),
+        values.get('checkpointRestores', False)
     )
 
 def showMenu(config):
@@ -123,37 +246,187 @@ def showMenu(config):
     if bool(answers):
         return answers['choice']
 
-def getDumps(config):
-    def getCreatedDate(config, file):
-        created_date_float = os.path.getctime(os.path.join(config.dumpFolder, file))
-        created_date = datetime.datetime.fromtimestamp(created_date_float).strftime("%m/%d/%Y, %H:%M:%S")
-        return created_date
-    return seq(os.listdir(config.dumpFolder)) \
-        .filter(lambda file: file.endswith(".sql")) \
-        .order_by(lambda file: os.path.getctime(os.path.join(config.dumpFolder, file))) \
-        .map(lambda file: (file, getCreatedDate(config, file))) \
-        .to_dict()
-
-def listDumps(config):
-    for dump, created_date in getDumps(config).items():
-        print(created_date + ' ' + dump)
+def getDumps(config, sort=constants.defaultDumpSort, name_filter=None):
+    key, reverse = DUMP_SORTS[sort]
+    dumps = refreshCatalog(config.dumpFolder).values()
+    if name_filter:
+        dumps = [dump for dump in dumps if name_filter.lower() in dump['name'].lower() or name_filter == dump.get('config')]
+    return sorted(dumps, key=key, reverse=reverse)
+
+def dumpDescription(dump):
+    description = '%s %9s %-9s %s' % (formatDate(dump['created']), formatSize(dump['size']), dump['format'], dump['name'])
+    if dump.get('subset'):
+        description += ' [subset]'
+    if dump.get('chain'):
+        description += ' [increment of %s]' % dump['chain']['parent'] if dump['chain']['parent'] else ' [chain base]'
+    if dump.get('snapshots'):
+        description += ' [snapshot: %s]' % ', '.join(sorted(dump['snapshots'].keys()))
+    return description
+
+def listDumps(config, sort=constants.defaultDumpSort, name_filter=None):
+    deduplicated_size = 0
+    for dump in getDumps(config, sort, name_filter):
+        details = ''
+        if dump.get('config'):
+            details = ' (config: %s, took %s)' % (dump['config'], formatDuration(dump.get('duration')))
+        if dump['format'] == 'dedup':
+            details += ' (stored %s of new chunks)' % formatSize(dump['physicalSize'])
+            deduplicated_size += dump['size']
+        print(dumpDescription(dump) + details)
+    if deduplicated_size:
+        print('Deduplicated dumps: %s, stored in %s of chunks' % (formatSize(deduplicated_size), formatSize(chunkStoreSize(config.dumpFolder))))
+
+def compareDumps(config):
+    dump = selectDump(config, 'What dump would you like to compare?')
+    if not dump:
+        return
+    other_dump = selectDump(config, "What dump would you like to compare '%s' with?" % dump)
+    if not other_dump:
+        return
+    answers = prompt({
+        'type': 'confirm',
+        'name': 'rows',
+        'message': 'Count the rows of every table as well? (slower for MySQL dumps)',
+        'default': False
+    }, style=constants.style)
+    if bool(answers):
+        compareNamedDumps(config, dump, other_dump, answers['rows'])
+
+def tableDigests(config, dump, rows):
+    entry = refreshCatalog(config.dumpFolder).get(dump)
+    if entry is None:
+        logError("Dump '%s' does not exist" % dump)
+        return None
+    if not isComparable(dump):
+        logError("Only plain dumps can be compared, '%s' is not one" % dump)
+        return None
+    progress = Progress("Reading '%s'" % dump, entry['size'])
+    tables = dumpDigests(config.dumpFolder, dump, rows, progress)
+    if tables is None:
+        progress.finish(False)
+        logError("Reading '%s' failed" % dump)
+    elif progress.bytes:
+        # Nothing was read when the digests came from the catalog
+        progress.finish()
+    return tables
+
+def compareNamedDumps(config, dump, other_dump, rows=False):
+    tables = tableDigests(config, dump, rows)
+    other_tables = tables is not None and tableDigests(config, other_dump, rows)
+    if tables is None or other_tables is None:
+        return None
+    differences = compareDigests(tables, other_tables)
+    for name, difference, table, other in differences:
+        if table is None or other is None:
+            difference = "only in '%s'" % (dump if table is not None else other_dump)
+        details = ''
+        if table is not None and other is not None:
+            details = ' (%s / %s' % (formatSize(table['size']), formatSize(other['size']))
+            if table['rows'] is not None and other['rows'] is not None:
+                details += ', %d / %d rows' % (table['rows'], other['rows'])
+            details += ')'
+        print(BColors.RED + '%-30s %s%s' % (name, difference, details) + BColors.NC)
+    identical = len(set(tables) | set(other_tables)) - len(differences)
+    if differences:
+        print("%d tables identical, %d differ between '%s' and '%s'" % (identical, len(differences), dump, other_dump))
+    else:
+        print(BColors.GREEN + "'%s' and '%s' are identical (%d tables)" % (dump, other_dump, identical) + BColors.NC)
+    return not differences
+
+def selectDump(config, message):
+    from functional import seq
+    from PyInquirer import Separator
+    sort = constants.defaultDumpSort
+    name_filter = None
+    page = 0
+    while True:
+        dumps = getDumps(config, sort, name_filter)
+        if not dumps and not name_filter:
+            logError("No dumps found in '%s'" % config.dumpFolder)
+            return None
+        page_count = max(1, (len(dumps) + constants.dumpsPageSize - 1) // constants.dumpsPageSize)
+        page = min(page, page_count - 1)
+        choices = seq(dumps[page * constants.dumpsPageSize:(page + 1) * constants.dumpsPageSize]) \
+            .map(lambda dump: {
+                'name': dumpDescription(dump),
+                'value': dump['name']
+            }) \
+            .to_list()
+        choices.append(Separator(' '))
+        if page < page_count - 1:
+            choices.append({'name': 'Next page', 'value': NEXT_PAGE})
+        if page > 0:
+            choices.append({'name': 'Previous page', 'value': PREVIOUS_PAGE})
+        choices.append({'name': 'Filter dumps' + (" (current: '%s')" % name_filter if name_filter else ''), 'value': FILTER_DUMPS})
+        choices.append({'name': 'Sort dumps (current: %s)' % sort, 'value': SORT_DUMPS})
+        questions = {
+            'type': 'list',
+            'name': 'dump',
+            'message': '%s (page %d/%d, %d dumps)' % (message, page + 1, page_count, len(dumps)),
+            'choices': choices
+        }
+        answers = prompt(questions, style=constants.style)
+        # Keyboard interrupt -> answers is empty
+        if not bool(answers):
+            return None
+        if answers['dump'] == NEXT_PAGE:
+            page += 1
+        elif answers['dump'] == PREVIOUS_PAGE:
+            page -= 1
+        elif answers['dump'] == FILTER_DUMPS:
+            filter_answers = prompt({
+                'type': 'input',
+                'name': 'filter',
+                'message': 'Show dumps whose name contains (or which were created by configuration), leave empty to show all:'
+            }, style=constants.style)
+            name_filter = filter_answers.get('filter') or None
+            page = 0
+        elif answers['dump'] == SORT_DUMPS:
+            sort_answers = prompt({
+                'type': 'list',
+                'name': 'sort',
+                'message': 'Sort dumps by:',
+                'choices': list(DUMP_SORTS.keys())
+            }, style=constants.style)
+            sort = sort_answers.get('sort', sort)
+            page = 0
+        else:
+            return answers['dump']
 
 def showAllConfig():
-    with open(getConfigFilePath(), 'r') as stream:
-        configs = yaml.safe_load(stream)
-        all_configs = seq(configs.keys()).filter(lambda key: key != constants.configToUseVarName).map(lambda key: (key, extractConfigToUse(key, configs))).to_dict()
-        for key, config in all_configs.items():
-            print(BColors.LIGHT_BLUE + 'Configuration: ' + str(key))
-            print(BColors.CYAN + 'database:' + str(config.database))
-            print(BColors.CYAN + 'dumpFolder:' + str(config.dumpFolder))
-            print(BColors.CYAN + 'databaseUser:' + str(config.databaseUser))
-            print(BColors.CYAN + 'databasePassword:' + str(config.databasePassword) + BColors.NC)
-            print(BColors.CYAN + 'databaseType:' + str(config.databaseType) + BColors.NC)
-            print(BColors.CYAN + 'isDocker:' + str(config.isDocker) + BColors.NC)
-            if config.isDocker:
-                print(BColors.CYAN + 'dockerPort:' + str(config.dockerPort) + BColors.NC)
-                print(BColors.CYAN + 'dockerContainerName:' + str(config.dockerContainerName) + BColors.NC)
-            print()
+    from functional import seq
+    configs = configStore().configs()
+    all_configs = seq(configs.keys()).filter(lambda key: key != constants.configToUseVarName).map(lambda key: (key, extractConfigToUse(key, configs))).to_dict()
+    for key, config in all_configs.items():
+        print(BColors.LIGHT_BLUE + 'Configuration: ' + str(key))
+        print(BColors.CYAN + 'database:' + str(config.database))
+        print(BColors.CYAN + 'dumpFolder:' + str(config.dumpFolder))
+        print(BColors.CYAN + 'databaseUser:' + str(config.databaseUser))
+        print(BColors.CYAN + 'databasePassword:' + str(config.databasePassword) + BColors.NC)
+        print(BColors.CYAN + 'databaseType:' + str(config.databaseType) + BColors.NC)
+        print(BColors.CYAN + 'compression:' + str(config.compression) + BColors.NC)
+        if config.compression != 'none':
+            print(BColors.CYAN + 'compressionLevel:' + str(config.compressionLevel) + BColors.NC)
+            print(BColors.CYAN + 'compressionThreads:' + str(config.compressionThreads) + BColors.NC)
+        print(BColors.CYAN + 'dumpFormat:' + str(config.dumpFormat) + BColors.NC)
+        if config.dumpFormat != 'plain':
+            print(BColors.CYAN + 'dumpJobs:' + str(config.dumpJobs) + BColors.NC)
+        else:
+            print(BColors.CYAN + 'storage:' + str(config.storage) + BColors.NC)
+            print(BColors.CYAN + 'incrementalDumps:' + str(config.incrementalDumps) + BColors.NC)
+        print(BColors.CYAN + 'fastRestore:' + str(config.fastRestore) + BColors.NC)
+        print(BColors.CYAN + 'checkpointRestores:' + str(config.checkpointRestores) + BColors.NC)
+        print(BColors.CYAN + 'isDocker:' + str(config.isDocker) + BColors.NC)
+        if config.isDocker:
+            print(BColors.CYAN + 'dockerPort:' + str(config.dockerPort) + BColors.NC)
+            print(BColors.CYAN + 'dockerContainerName:' + str(config.dockerContainerName) + BColors.NC)
+            print(BColors.CYAN + 'dockerTransport:' + str(config.dockerTransport) + BColors.NC)
+            if config.dockerTransport == 'mount':
+                print(BColors.CYAN + 'dockerDumpFolder:' + str(config.dockerDumpFolder) + BColors.NC)
+        if hasSubset(config):
+            print(BColors.CYAN + 'subsetTables:' + str(config.subsetTables) + BColors.NC)
+            print(BColors.CYAN + 'subsetSchemaOnly:' + str(config.subsetSchemaOnly) + BColors.NC)
+        print()
 
 def showConfig(config):
     print()
@@ -163,100 +436,751 @@ def showConfig(config):
     print(BColors.CYAN + '- databaseUser:' + str(config.databaseUser))
     print(BColors.CYAN + '- databasePassword:' + str(config.databasePassword) + BColors.NC)
     print(BColors.CYAN + '- databaseType:' + str(config.databaseType) + BColors.NC)
+    print(BColors.CYAN + '- compression:' + str(config.compression) + BColors.NC)
+    if config.compression != 'none':
+        print(BColors.CYAN + '- compressionLevel:' + str(config.compressionLevel) + BColors.NC)
+        print(BColors.CYAN + '- compressionThreads:' + str(config.compressionThreads) + BColors.NC)
+    print(BColors.CYAN + '- dumpFormat:' + str(config.dumpFormat) + BColors.NC)
+    if config.dumpFormat != 'plain':
+        print(BColors.CYAN + '- dumpJobs:' + str(config.dumpJobs) + BColors.NC)
+    else:
+        print(BColors.CYAN + '- storage:' + str(config.storage) + BColors.NC)
+        print(BColors.CYAN + '- incrementalDumps:' + str(config.incrementalDumps) + BColors.NC)
+    print(BColors.CYAN + '- fastRestore:' + str(config.fastRestore) + BColors.NC)
+    print(BColors.CYAN + '- checkpointRestores:' + str(config.checkpointRestores) + BColors.NC)
     print(BColors.CYAN + '- isDocker:' + str(config.isDocker) + BColors.NC)
     if config.isDocker:
         print(BColors.CYAN + '- dockerPort:' + str(config.dockerPort) + BColors.NC)
         print(BColors.CYAN + '- dockerContainerName:' + str(config.dockerContainerName) + BColors.NC)
+        print(BColors.CYAN + '- dockerTransport:' + str(config.dockerTransport) + BColors.NC)
+        if config.dockerTransport == 'mount':
+            print(BColors.CYAN + '- dockerDumpFolder:' + str(config.dockerDumpFolder) + BColors.NC)
+    if hasSubset(config):
+        print(BColors.CYAN + '- subsetTables:' + str(config.subsetTables) + BColors.NC)
+        print(BColors.CYAN + '- subsetSchemaOnly:' + str(config.subsetSchemaOnly) + BColors.NC)
 
+@recorded('restore')
 def restoreDump(config):
-    dumps_dict = getDumps(config)
-    dumps_choices = seq(dumps_dict.keys()) \
-        .map(lambda key: {
-            'name': dumps_dict[key] + ' ' + key,
-            'value': key
-        })
-    if dumps_choices:
-        questions = {
-            'type': 'list',
-            'name': 'dump',
-            'message': 'What dump would you like to restore?',
-            'choices': dumps_choices
+    dump = selectDump(config, 'What dump would you like to restore?')
+    if dump:
+        print('Cleaning the current database...')
+        cleanDatabase(config)
+        dump_to_restore = os.path.join(config.dumpFolder, dump)
+        print('This can take a while depending on the size of the dump...')
+        if not restoreDatabase(config, dump_to_restore):
+            logError("Restoring '%s' failed" % dump_to_restore)
+            return False
+        return True
+
+def restoreDumpTables(config):
+    dump = selectDump(config, 'From what dump would you like to restore tables?')
+    if not dump:
+        return
+    dump_to_restore = os.path.join(config.dumpFolder, dump)
+    table_names = dumpTableNames(dump_to_restore)
+    if not table_names:
+        return
+    answers = prompt([
+        {
+            'type': 'checkbox',
+            'name': 'tables',
+            'message': 'What tables do you want to restore?',
+            'choices': [{'name': table} for table in table_names]
+        },
+        {
+            'type': 'input',
+            'name': 'jobs',
+            'message': 'Number of concurrent sessions:',
+            'default': str(dumpJobs(config)),
+            'validate': lambda val: val.isdigit() and int(val) > 0 or 'Please enter a number'
+        },
+        {
+            'type': 'confirm',
+            'name': 'clean',
+            'message': 'Make ' + config.database + ' empty first?',
+            'default': True
         }
-        answers = prompt(questions, style=constants.style)
-        # Keyboard interrupt -> answers is empty
-        if bool(answers):
-            print('Cleaning the current database...')
-            cleanDatabase(config)
-            dump_to_restore = os.path.join(config.dumpFolder, answers['dump'])
-            print('This can take a while depending on the size of the dump...')
-            # docker exec -i mysql_slims_66 sh -c 'exec mysql -uroot -p\"$MYSQL_ROOT_PASSWORD\" slimsdb66 ' < /Users/dekeyzer/Documents/DbDumps/SLIMS/6.6/slims65_start.sql
-            if config.databaseType == 'mysql':
-                if config.isDocker:
-                    os.system("docker exec -i %s sh -c 'exec mysql -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s ' < %s" % (config.dockerContainerName, config.database, dump_to_restore))
-                else:
-                    os.system("mysql -u %s -p%s %s < %s" % (config.databaseUser, config.databasePassword, config.database, dump_to_restore))
-            elif config.databaseType == 'postgres':
-                if config.isDocker:
-                    os.system("docker exec -i %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\" && psql -U %s -d %s' < %s" % (config.dockerContainerName, config.databaseUser, config.database, dump_to_restore))
-                else:
-                    os.environ["PGPASSWORD"] = config.databasePassword
-                    os.system("psql -U %s -d %s < %s" % (config.databaseUser, config.database, dump_to_restore))
-                    os.environ.pop("PGPASSWORD", None)
+    ], style=constants.style)
+    if not bool(answers) or not answers['tables']:
+        return
+    if answers['clean']:
+        recreateDatabase(config)
+    if not restoreDatabase(config, dump_to_restore, tables=answers['tables'], jobs=int(answers['jobs'])):
+        logError("Restoring tables from '%s' failed" % dump_to_restore)
+
+def dumpTableNames(dump_to_restore):
+    dump_format = dumpFormatOf(dump_to_restore)
+    if dump_format == 'directory' and os.path.exists(os.path.join(dump_to_restore, MANIFEST_FILE)):
+        return [table['name'] for table in readTablesManifest(dump_to_restore)['tables']]
+    if not isIndexable(dump_to_restore):
+        logError("Only uncompressed or deduplicated plain dumps and MySQL directory dumps can be restored by table, '%s' can not" % dump_to_restore)
+        return None
+    # Built in one pass over the dump on first use, later restores read the cached index
+    return [table['name'] for table in loadIndex(dump_to_restore)['tables']]
+
+def listDumpTables(config, dump_to_restore):
+    if not os.path.exists(dump_to_restore):
+        logError("Dump '%s' does not exist" % dump_to_restore)
+        return False
+    if not isIndexable(dump_to_restore):
+        table_names = dumpTableNames(dump_to_restore)
+        if table_names is None:
+            return False
+        for table in table_names:
+            print(table)
+        return True
+    for table in loadIndex(dump_to_restore)['tables']:
+        print('%9s %s' % (formatSize(table['size']), table['name']))
+    return True
+
+@recorded('restore')
+def restoreDatabase(config, dump_to_restore, fast=None, tables=None, jobs=None, resume=None, checkpointed=True):
+    if fast is None:
+        fast = config.fastRestore
+    in_dump_folder = os.path.dirname(os.path.abspath(dump_to_restore)) == os.path.abspath(config.dumpFolder)
+    dump = os.path.basename(dump_to_restore)
+    describeOperation(dump=dump)
+    # Restoring part of a dump or restoring it by table is not comparable with a snapshot or with other restores
+    by_table = tables is not None or (jobs or 1) > 1
+    if resume is None and tables is None and checkpointStore().restore(config.config_id):
+        # The database is cleaned before every restore, what an interrupted restore got done is gone
+        checkpointStore().finish(config.config_id)
+    snapshot = getSnapshot(config, dump) if in_dump_folder and tables is None and resume is None else None
+    if snapshot:
+        print("Restoring from snapshot '%s' instead of replaying the dump..." % snapshot['database'])
+        started = time.time()
+        if restoreSnapshot(config, snapshot):
+            print('Restored the snapshot in %s' % formatDuration(time.time() - started))
+            return True
+        logError("Restoring snapshot '%s' failed, replaying the dump instead" % snapshot['database'])
+        recreateDatabase(config)
+    entries = refreshCatalog(config.dumpFolder) if in_dump_folder and tables is None else {}
+    if entries.get(dump, {}).get('chain') and entries[dump]['chain']['parent']:
+        chain = dumpChain(entries, dump)
+        if chain is None:
+            logError("A dump of the chain '%s' belongs to is missing, it can not be restored" % dump)
+            return False
+        return restoreChain(config, chain, fast, jobs)
+    checkpoint = restoreCheckpoint(config, dump_to_restore, fast, tables, jobs, resume) if checkpointed else None
+    if os.path.isdir(dump_to_restore):
+        size = remainingTablesSize(dump_to_restore, checkpoint.done) if checkpoint else directorySize(dump_to_restore)
+    elif (by_table or checkpoint) and isIndexable(dump_to_restore):
+        size = restoreSize(loadIndex(dump_to_restore), tables, done=checkpoint.done if checkpoint else ())
+    elif dumpFormatOf(dump_to_restore) == 'dedup':
+        size = readManifest(dump_to_restore)['size']
     else:
-        logError("No dumps found in '%s'" % config.dumpFolder)
-    
+        size = os.path.getsize(dump_to_restore)
+    action = 'Resuming the restore of' if resume is not None else 'Fast restoring' if fast else 'Restoring'
+    progress = Progress("%s '%s'" % (action, dump), size)
+    success = loadDump(config, dump_to_restore, progress, fast, tables, jobs, checkpoint)
+    progress.finish(success)
+    if checkpoint and success:
+        checkpointStore().finish(config.config_id)
+    elif checkpoint:
+        logError("The restore of '%s' stopped after %d tables, 'Resume an interrupted restore' continues it without cleaning the database" % (dump, len([step for step in checkpoint.done if step.startswith('table:')])))
+    if success and in_dump_folder and not by_table and not checkpoint:
+        reportRestoreDuration(config, dump, progress.elapsed(), fast)
+    return success
 
-def createDump(config):
+def restoreCheckpoint(config, dump_to_restore, fast, tables, jobs, resume=None):
+    # Restores that run table by table record every step they finish, an interrupted one continues from there
+    store = checkpointStore()
+    if resume is not None:
+        return Checkpoint(store, config.config_id, resume, resumed=True)
+    if tables is not None or not (config.checkpointRestores or (jobs or 1) > 1):
+        return None
+    if not isIndexable(dump_to_restore) and not os.path.exists(os.path.join(dump_to_restore, MANIFEST_FILE)):
+        return None
+    store.start(config.config_id, dump_to_restore, fast, jobs)
+    return Checkpoint(store, config.config_id)
+
+def checkpointStore():
+    return CheckpointStore(os.path.dirname(os.path.abspath(sys.argv[0])))
+
+@recorded('resume')
+def resumeRestore(config):
+    restore = checkpointStore().restore(config.config_id)
+    if restore is None:
+        logError('Configuration %s has no interrupted restore' % config.config_id)
+        return False
+    if not isUnchanged(restore):
+        logError("'%s' changed or is gone since its restore started, restore it again from the start" % restore['dump'])
+        return False
+    print("Resuming the restore of '%s' started %s, %d steps are done..." % (restore['dump'], formatDate(restore['started']), len(restore['done'])))
+    return restoreDatabase(config, restore['dump'], restore['fast'], jobs=restore['jobs'], resume=restore['done'])
+
+def restoreChain(config, chain, fast, jobs=None):
+    # The full dump first, then the changes of every increment in the order they were taken
+    print("'%s' is increment %d of '%s', replaying the chain..." % (chain[-1], len(chain) - 1, chain[0]))
+    # A resumed base would not replay the increments after it, the chain is restored in one go
+    if not restoreDatabase(config, os.path.join(config.dumpFolder, chain[0]), fast, jobs=jobs, checkpointed=False):
+        return False
+    for increment in chain[1:]:
+        increment_location = os.path.join(config.dumpFolder, increment)
+        size = readManifest(increment_location)['size'] if dumpFormatOf(increment_location) == 'dedup' else os.path.getsize(increment_location)
+        progress = Progress("Replaying '%s'" % increment, size)
+        success = restoreFromFile(config, increment_location, progress)
+        progress.finish(success)
+        if not success:
+            logError("Replaying increment '%s' failed" % increment)
+            return False
+    return True
+
+def reportRestoreDuration(config, dump, duration, fast):
+    entry = refreshCatalog(config.dumpFolder).get(dump)
+    if entry is None:
+        return
+    restore_durations = dict(entry.get('restoreDurations', {}))
+    normal_duration = restore_durations.get('normal')
+    restore_durations['fast' if fast else 'normal'] = duration
+    updateDump(config.dumpFolder, dump, restoreDurations=restore_durations)
+    if not fast:
+        return
+    if normal_duration:
+        print('Fast restore took %s, the last normal restore of this dump took %s (%.1fx)' % (formatDuration(duration), formatDuration(normal_duration), normal_duration / max(duration, 0.001)))
+    else:
+        print('Fast restore took %s, there is no timed normal restore of this dump to compare with' % formatDuration(duration))
+
+def loadDump(config, dump_to_restore, progress, fast=False, tables=None, jobs=None, checkpoint=None):
+    dump_format = dumpFormatOf(dump_to_restore)
+    if tables is not None and not checkTables(dump_to_restore, tables):
+        return False
+    if dump_format == 'directory' and os.path.exists(os.path.join(dump_to_restore, MANIFEST_FILE)):
+        if config.databaseType != 'mysql':
+            logError("'%s' is a MySQL directory dump, it can not be restored into a %s database" % (dump_to_restore, config.databaseType))
+            return False
+        return restoreTables(config, dump_to_restore, progress, fast, tables, jobs, checkpoint)
+    if dump_format in ['custom', 'directory']:
+        if config.databaseType != 'postgres':
+            logError("'%s' is a PostgreSQL %s format dump, it can not be restored into a %s database" % (dump_to_restore, dump_format, config.databaseType))
+            return False
+        mounted_path = mountedPath(config, dump_to_restore)
+        if mounted_path:
+            success = runPipeline([pgRestoreCommand(config, mounted_path, fast, tables, jobs)])
+        elif dockerExec(config):
+            # pg_restore can only run jobs in parallel on a seekable archive, so the dump is copied into the container first
+            container_path = containerPath(dump_to_restore)
+            success = runPipeline([dockerCopyToCommand(config, dump_to_restore, container_path)]) \
+                and runPipeline([pgRestoreCommand(config, container_path, fast, tables, jobs)])
+            runPipeline([dockerRemoveCommand(config, container_path)])
+        else:
+            success = runPipeline([pgRestoreCommand(config, dump_to_restore, fast, tables, jobs)], env=clientEnv(config))
+        # pg_restore reads the archive itself, the progress can only be updated once it is done
+        if success:
+            progress.update(progress.total)
+        return success
+    if tables is not None or (jobs or 1) > 1 or checkpoint is not None:
+        if not isIndexable(dump_to_restore):
+            logError("Only uncompressed or deduplicated plain dumps can be restored by table, '%s' can not" % dump_to_restore)
+            return False
+        return restoreRanges(config, dump_to_restore, loadIndex(dump_to_restore), tables, jobs, progress, fast, checkpoint)
+    mounted_path = mountedPath(config, dump_to_restore)
+    # The container reads uncompressed dumps from the bind mount itself. Compressed and deduplicated dumps, and fast
+    # MySQL restores which wrap the dump in session settings, are still streamed into the container.
+    if mounted_path and dump_format == 'plain' and compressionOf(dump_to_restore) == 'none' and not (fast and config.databaseType == 'mysql'):
+        success = runPipeline([mountedRestoreCommand(config, mounted_path, fast)])
+        if success:
+            progress.update(progress.total)
+        return success
+    return restoreFromFile(config, dump_to_restore, progress, fast)
+
+def checkTables(dump_to_restore, tables):
+    if dumpFormatOf(dump_to_restore) == 'custom' or (dumpFormatOf(dump_to_restore) == 'directory' and not os.path.exists(os.path.join(dump_to_restore, MANIFEST_FILE))):
+        # pg_restore selects the tables of its archives itself
+        return True
+    table_names = dumpTableNames(dump_to_restore)
+    if table_names is None:
+        return False
+    unknown = [table for table in tables if table not in table_names]
+    if unknown:
+        logError("'%s' has no tables %s" % (dump_to_restore, ', '.join(unknown)))
+        return False
+    return True
+
+
+@recorded('snapshot')
+def snapshotDump(config):
+    dump = selectDump(config, 'What dump would you like to snapshot?')
+    if not dump:
+        return
+    if getSnapshot(config, dump):
+        print("'%s' already has a snapshot for configuration %s" % (dump, config.config_id))
+        return
+    print('Cleaning the current database...')
+    cleanDatabase(config)
+    return createDumpSnapshot(config, dump)
+
+@recorded('snapshot')
+def createDumpSnapshot(config, dump):
+    if dump not in refreshCatalog(config.dumpFolder):
+        logError("'%s' is not a dump in '%s', only dumps of the dump folder can have a snapshot" % (dump, config.dumpFolder))
+        return False
+    dump_to_restore = os.path.join(config.dumpFolder, dump)
+    if not restoreDatabase(config, dump_to_restore):
+        logError("Restoring '%s' failed" % dump_to_restore)
+        return False
+    unsupported = unsupportedObjects(config)
+    if unsupported:
+        logError('Can not snapshot %s: %s' % (dump, unsupported))
+        return False
+    print('Creating the snapshot...')
+    snapshot = createSnapshot(config, dump)
+    if not snapshot:
+        logError("Creating a snapshot of '%s' failed" % dump)
+        return False
+    print("Snapshot '%s' created, restoring '%s' will now copy the snapshot" % (snapshot, dump))
+    return True
+
+def removeDumpSnapshot(config):
+    dump = selectDump(config, 'Of what dump would you like to remove the snapshot?')
+    if dump and not removeSnapshot(config, dump):
+        logError("'%s' has no snapshot for configuration %s" % (dump, config.config_id))
+
+def removeUnusedChunks(config):
+    removed_chunks, removed_size = collectGarbage(config.dumpFolder)
+    print('Removed %d unused chunks, freed %s' % (removed_chunks, formatSize(removed_size)))
+
+def askDumpName(config):
     now = date.today().strftime("%b-%d-%Y")
+    extension = dumpExtension(config)
     questions = {
         'type': 'input',
         'name': 'dump_name',
-        'message': "Name of the dump (will automatically be affixed by the current date and extension '_%s.sql')" % (now)
+        'message': "Name of the dump (will automatically be affixed by the current date and extension '_%s%s')" % (now, extension)
     }
     answers = prompt(questions, style=constants.style)
     if bool(answers):
-        dump_location = config.dumpFolder + '/' + answers['dump_name'] + '_' + now + '.sql'
-        if config.databaseType == 'mysql':
-            if config.isDocker:
-                os.system("docker exec %s sh -c 'exec mysqldump -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s' > %s" % (config.dockerContainerName, config.database, dump_location))
-            else:
-                os.system("mysqldump -u %s -p%s %s > %s" % (config.databaseUser, config.databasePassword, config.database, dump_location))
-        elif config.databaseType == 'postgres':
-            if config.isDocker:
-                os.system("docker exec %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\" && pg_dump -U %s -d %s' > %s" % (config.dockerContainerName, config.databaseUser, config.database, dump_location))
-            else:
-                os.environ["PGPASSWORD"] = config.databasePassword
-                os.system("pg_dump -U %s -d %s > %s" % (config.databaseUser, config.database, dump_location))
-                os.environ.pop("PGPASSWORD", None)
+        return answers['dump_name']
+    return None
 
-def cleanDatabase(config):
-    questions = {
+def createDump(config):
+    dump_name = askDumpName(config)
+    if dump_name is not None:
+        incremental = askIncremental(config)
+        createNamedDump(config, dump_name, subset=not incremental and askSubset(config), incremental=incremental)
+
+def hasSubset(config):
+    return bool(config.subsetTables or config.subsetSchemaOnly)
+
+def askSubset(config):
+    if not hasSubset(config):
+        return False
+    answers = prompt({
         'type': 'confirm',
-        'message': 'Are you sure you want to drop the ' + config.database,
-        'name': 'continue',
-    }
-    answers = prompt(questions, style=constants.style)
-    if not answers['continue']:
+        'name': 'subset',
+        'message': 'Only dump the subset of the configuration (%d filtered tables, %d tables without rows)?' % (len(config.subsetTables or {}), len(config.subsetSchemaOnly or [])),
+        'default': True
+    }, style=constants.style)
+    return bool(answers) and answers['subset']
+
+def askIncremental(config):
+    if not isIncremental(config):
+        return False
+    parent = chainHead(refreshCatalog(config.dumpFolder), config)
+    if parent is None:
+        return False
+    answers = prompt({
+        'type': 'confirm',
+        'name': 'incremental',
+        'message': "Only dump the changes since '%s'?" % parent['name'],
+        'default': True
+    }, style=constants.style)
+    return bool(answers) and answers['incremental']
+
+def dumpLocation(config, dump_name, extension=None):
+    now = date.today().strftime("%b-%d-%Y")
+    return config.dumpFolder + '/' + dump_name + '_' + now + (extension or dumpExtension(config))
+
+@recorded('dump')
+def createNamedDump(config, dump_name, live_progress=None, subset=False, incremental=False):
+    dump_location = dumpLocation(config, dump_name)
+    if incremental:
+        return createIncrement(config, dump_location, live_progress)
+    if config.dumpFormat == 'directory' and os.path.exists(dump_location):
+        # A directory dump can not be written over, and a failed dump would remove the earlier one on its way out
+        logError("Dump '%s' already exists, choose another name or remove it first" % dump_location)
+        return None
+    started = time.time()
+    checksum = hashlib.sha256()
+    describeOperation(dump=os.path.basename(dump_location))
+    chain = None
+    if isIncremental(config) and not subset:
+        # The slot has to exist before the dump starts, otherwise the changes made while dumping are lost
+        chain = {'parent': None, 'position': createSlot(config) if config.databaseType == 'postgres' else None}
+        if config.databaseType == 'postgres' and chain['position'] is None:
+            logError('Creating replication slot %s failed, is wal_level set to logical?' % slotName(config))
+            return None
+    progress = Progress("Dumping '%s'" % os.path.basename(dump_location), live=live_progress)
+    success = dumpDatabase(config, dump_location, checksum, progress, subset)
+    progress.finish(success)
+    if not success and chain is not None and config.databaseType == 'postgres':
+        # A slot nothing reads keeps every change of the server
+        dropSlot(config)
+    if success and chain is not None and config.databaseType == 'mysql':
+        chain['position'] = binlogPosition(dump_location)
+        if chain['position'] is None:
+            logError("'%s' does not record a binlog position, is the binary log enabled? It can not start a chain" % dump_location)
+            chain = None
+    if success:
+        # Only dumps that streamed through jdump have been hashed
+        streamed = subset or (config.dumpFormat != 'directory' and not mountedDumpPath(config, dump_location))
+        subset_rules = {'tables': config.subsetTables or {}, 'schemaOnly': config.subsetSchemaOnly or []} if subset else None
+        recordDump(config, dump_location, started, time.time() - started, checksum.hexdigest() if streamed else None, subset_rules, chain)
+        return dump_location
+    logError("Creating dump '%s' failed, removing the incomplete dump" % dump_location)
+    removeDump(dump_location)
+    return None
+
+def createIncrement(config, dump_location, live_progress=None):
+    if not isIncremental(config):
+        logError('Incremental dumps are not enabled for configuration %s, they need incrementalDumps and the plain dump format' % config.config_id)
+        return None
+    parent = chainHead(refreshCatalog(config.dumpFolder), config)
+    if parent is None:
+        logError('There is no full dump of configuration %s to continue from, create a full dump first' % config.config_id)
+        return None
+    started = time.time()
+    checksum = hashlib.sha256()
+    describeOperation(dump=os.path.basename(dump_location), parent=parent['name'])
+    progress = Progress("Dumping the changes since '%s'" % parent['name'], live=live_progress)
+    position, skipped, error = dumpIncrement(config, parent['chain']['position'], dump_location, checksum, progress)
+    progress.finish(error is None)
+    if error:
+        logError("Creating increment '%s' failed (%s), removing the incomplete dump" % (dump_location, error))
+        removeDump(dump_location)
+        return None
+    if skipped:
+        logError('%d updates or deletes of tables without a primary key or replica identity are not in the increment' % skipped)
+    recordDump(config, dump_location, started, time.time() - started, checksum.hexdigest(), chain={'parent': parent['name'], 'position': position})
+    # The slot keeps the changes until it is moved past them, only once the increment is safely written
+    if config.databaseType == 'postgres' and not advanceSlot(config, position):
+        logError('Advancing replication slot %s failed, the next increment advances it first' % position['slot'])
+    return dump_location
+
+def isIncremental(config):
+    return bool(config.incrementalDumps) and config.dumpFormat == 'plain'
+
+def copyToConfiguration(config):
+    configs = configStore().configs()
+    targets = [key for key in configs.keys() if key not in [constants.configToUseVarName, config.config_id] and configs[key].get('databaseType', 'mysql') == config.databaseType]
+    if not targets:
+        logError('There is no other %s configuration to copy %s to' % (config.databaseType, config.database))
         return
-        
-    if config.databaseType == 'mysql':
-        if config.isDocker:
-            os.system("docker exec %s sh -c 'exec mysqladmin -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" -f drop %s'" % (config.dockerContainerName, config.database))
-            os.system("docker exec %s sh -c 'exec mysqladmin -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" create %s'" % (config.dockerContainerName, config.database))
+    answers = prompt([
+        {
+            'type': 'list',
+            'name': 'target',
+            'message': 'To what configuration do you want to copy %s?' % config.database,
+            'choices': [{'name': '%s (%s)' % (key, configs[key]['database']), 'value': key} for key in targets]
+        },
+        {
+            'type': 'input',
+            'name': 'dump_name',
+            'message': "Name of a compressed dump of the copy to keep in '%s' (leave empty to keep none)" % config.dumpFolder
+        }
+    ], style=constants.style)
+    if not bool(answers):
+        return
+    target = configStore().configObject(answers['target'])
+    if confirmDrop(target):
+        copyConfiguration(config, target, answers['dump_name'] or None)
+
+@recorded('copy')
+def copyConfiguration(config, target, dump_name=None):
+    if target.config_id == config.config_id:
+        logError('A configuration can not be copied to itself')
+        return False
+    if target.databaseType != config.databaseType:
+        logError('%s is a %s configuration, %s can only be copied to a %s configuration' % (target.config_id, target.databaseType, config.config_id, config.databaseType))
+        return False
+    if isSameServer(config, target) and target.database == config.database:
+        # The target is dropped before the copy starts, it would take the source with it
+        logError('%s and %s are the same database %s on %s, a database can not be copied to itself' % (config.config_id, target.config_id, config.database, hostKey(config)))
+        return False
+    dump_location = dumpLocation(config, dump_name, copyExtension(config)) if dump_name else None
+    describeOperation(target=target.config_id, dump=os.path.basename(dump_location) if dump_location else None)
+    if not recreateDatabase(target):
+        logError("Cleaning '%s' of configuration %s failed" % (target.database, target.config_id))
+        return False
+    started = time.time()
+    checksum = hashlib.sha256()
+    progress = Progress("Copying %s to %s" % (config.database, target.config_id))
+    copied, kept = copyDatabase(config, target, dump_location, checksum, progress)
+    progress.finish(copied)
+    if not copied:
+        logError('Copying %s to configuration %s failed' % (config.database, target.config_id))
+    if dump_location and kept:
+        recordDump(config, dump_location, started, time.time() - started, checksum.hexdigest())
+    elif dump_location:
+        if copied:
+            logError("Keeping the dump '%s' failed, removing the incomplete dump" % dump_location)
+        removeDump(dump_location)
+    return copied
+
+def dumpConfigurations():
+    configs = configStore().configs()
+    answers = prompt([
+        {
+            'type': 'checkbox',
+            'name': 'configurations',
+            'message': 'What configurations do you want to dump?',
+            'choices': [{'name': str(key), 'value': key, 'checked': True} for key in configs.keys() if key != constants.configToUseVarName]
+        },
+        {
+            'type': 'input',
+            'name': 'dump_name',
+            'message': 'Name of the dumps (will automatically be affixed by the configuration, the current date and extension)'
+        }
+    ], style=constants.style)
+    if bool(answers) and answers['configurations']:
+        createConfigurationDumps(answers['configurations'], answers['dump_name'])
+
+def createConfigurationDumps(config_ids, dump_name, per_host=constants.dumpsPerHost):
+    import yaml
+    try:
+        configs = configStore().configs()
+    except yaml.YAMLError as exc:
+        logError(str(exc))
+        return False
+    if not config_ids:
+        config_ids = [key for key in configs.keys() if key != constants.configToUseVarName]
+    unknown = [str(key) for key in config_ids if key not in configs]
+    if unknown:
+        logError('Could not find configurations %s' % ', '.join(unknown))
+        return False
+    config_objects = [configStore().configObject(key) for key in config_ids]
+    print('Dumping %d configurations, at most %d at a time per database server...' % (len(config_objects), per_host))
+    # Several progress lines can not share one terminal line, every dump only prints its summary.
+    # Configurations can share a dump folder, the configuration key keeps their dump names apart.
+    results = runPerHost(config_objects, lambda config: createNamedDump(config, '%s_%s' % (dump_name, config.config_id), live_progress=False), per_host)
+    printDumpResults(results)
+    return all(result['result'] for result in results)
+
+def printDumpResults(results):
+    print()
+    print('%-20s %-25s %-6s %9s %9s  %s' % ('Configuration', 'Server', 'Result', 'Duration', 'Size', 'Dump'))
+    for result in results:
+        dump_location = result['result']
+        if dump_location:
+            entry = refreshCatalog(os.path.dirname(dump_location)).get(os.path.basename(dump_location)) or {}
+            line = '%-20s %-25s %-6s %9s %9s  %s' % (result['config'], result['host'], 'OK', formatDuration(result['duration']), formatSize(entry.get('size')), dump_location)
+            print(BColors.GREEN + line + BColors.NC)
         else:
-            os.system("mysqladmin -u %s -p%s drop %s" % (config.databaseUser, config.databasePassword, config.database))
-            os.system("mysqladmin -u %s -p%s create %s" % (config.databaseUser, config.databasePassword, config.database))
-    elif config.databaseType == 'postgres':
-        if config.isDocker:
-            os.system("docker exec %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\" && dropdb -U %s --if-exists %s && createdb -U %s %s'" % 
-                    (config.dockerContainerName, config.databaseUser, config.database, config.databaseUser, config.database))
+            line = '%-20s %-25s %-6s %9s %9s' % (result['config'], result['host'], 'FAILED', formatDuration(result['duration']), '-')
+            print(BColors.RED + line + BColors.NC)
+
+def dumpDatabase(config, dump_location, checksum=None, progress=None, subset=False):
+    if subset:
+        if config.dumpFormat != 'plain':
+            logError('Subset dumps can only be plain dumps')
+            return False
+        command = subsetDumpCommand(config)
+        if config.storage == 'dedup':
+            return dumpToChunks(config, command, dump_location, checksum, progress)
+        return dumpToFile(config, command, dump_location, checksum, progress)
+    if config.databaseType == 'mysql':
+        if config.dumpFormat == 'directory':
+            if os.path.exists(dump_location):
+                logError("'%s' already exists, the tables can not be dumped into it" % dump_location)
+                return False
+            return dumpTables(config, dump_location, progress)
+        if config.dumpFormat != 'plain':
+            logError("Dump format '%s' is only supported for PostgreSQL databases" % config.dumpFormat)
+            return False
+    mounted_path = mountedDumpPath(config, dump_location)
+    if mounted_path:
+        success = runPipeline([mountedDumpCommand(config, mounted_path)])
+        # The container writes the dump itself, the progress can only be updated once it is done
+        if success and progress:
+            progress.update(directorySize(dump_location) if os.path.isdir(dump_location) else os.path.getsize(dump_location))
+        return success
+    if config.dumpFormat == 'directory':
+        if dockerExec(config):
+            # pg_dump writes the directory inside the container, copy it out afterwards
+            container_path = containerPath(dump_location)
+            success = runPipeline([pgDumpCommand(config, container_path)]) \
+                and runPipeline([dockerCopyFromCommand(config, container_path, dump_location)])
+            runPipeline([dockerRemoveCommand(config, container_path)])
         else:
-            os.environ["PGPASSWORD"] = config.databasePassword
-            os.system("dropdb -U %s --if-exists %s" % (config.databaseUser, config.database))
-            os.system("createdb -U %s %s" % (config.databaseUser, config.database))
-            os.environ.pop("PGPASSWORD", None)
+            success = runPipeline([pgDumpCommand(config, dump_location)], env=clientEnv(config))
+        # pg_dump writes the directory itself, the progress can only be updated once it is done
+        if success and progress:
+            progress.update(directorySize(dump_location))
+        return success
+    if config.dumpFormat == 'custom':
+        with open(dump_location, 'wb') as dump_file:
+            return runPipeline([dumpCommand(config)], stdout=dump_file, env=clientEnv(config), checksum=checksum, progress=progress)
+    command = baseDumpCommand(config) if isIncremental(config) else dumpCommand(config)
+    if config.storage == 'dedup':
+        return dumpToChunks(config, command, dump_location, checksum, progress)
+    return dumpToFile(config, command, dump_location, checksum, progress)
+
+def mountedDumpPath(config, dump_location):
+    # The container can only write the dump itself when jdump does not have to compress, chunk or split it
+    if config.dumpFormat == 'plain' and (config.compression != 'none' or config.storage == 'dedup'):
+        return None
+    if config.databaseType == 'mysql' and config.dumpFormat != 'plain':
+        return None
+    if isIncremental(config):
+        # The position of a chain is read from the dump or needs the slot of this very dump
+        return None
+    return mountedPath(config, dump_location)
+
+def removeDump(dump_location):
+    if os.path.isdir(dump_location):
+        shutil.rmtree(dump_location, ignore_errors=True)
+    elif os.path.exists(dump_location):
+        os.remove(dump_location)
+    removeIndex(dump_location)
+
+def showStatistics(config_id=None):
+    records = [record for record in readHistory(historyFile()) if config_id is None or record['config'] == config_id]
+    if not records:
+        print('No operations recorded yet')
+        return
+    print('%-20s %-9s %5s %6s %9s %9s %9s  %s' % ('Configuration', 'Operation', 'Runs', 'Failed', 'p50', 'p90', 'p99', 'Last run'))
+    for statistics in operationStatistics(records):
+        seconds = statistics['seconds'] or {}
+        line = '%-20s %-9s %5d %6d %9s %9s %9s  %s' % (statistics['config'], statistics['operation'], statistics['runs'], statistics['failures'],
+                                                      formatSeconds(seconds.get('p50')), formatSeconds(seconds.get('p90')), formatSeconds(seconds.get('p99')), formatDate(statistics['last']))
+        print((BColors.RED if statistics['failures'] else BColors.GREEN) + line + BColors.NC)
+        for phase, timings in sorted(statistics['phases'].items()):
+            print('%-20s %-9s %5s %6s %9s %9s %9s' % ('', '- ' + phase, '', '', formatSeconds(timings['p50']), formatSeconds(timings['p90']), formatSeconds(timings['p99'])))
+
+def operation(config, name):
+    return recordOperation(historyFile(), config, name)
+
+def jobStore():
+    script = os.path.abspath(sys.argv[0])
+    return JobStore(os.path.dirname(script), script)
+
+def submitJob(job_type, config, **arguments):
+    job = jobStore().submit(job_type, config.config_id, **arguments)
+    print('Job %d (%s) queued, follow it with Show jobs' % (job['id'], job_type))
+    return job
+
+def submitDumpJob(config):
+    dump_name = askDumpName(config)
+    if dump_name is not None:
+        incremental = askIncremental(config)
+        submitJob('dump', config, dump=dump_name, subset=not incremental and askSubset(config), incremental=incremental)
+
+def submitRestoreJob(config):
+    dump = selectDump(config, 'What dump would you like to restore in the background?')
+    if dump and confirmDrop(config):
+        submitJob('restore', config, dump=dump)
+
+def submitCleanJob(config):
+    if confirmDrop(config):
+        submitJob('clean', config)
+
+def jobDescription(job):
+    target = job['arguments'].get('dump') or ''
+    progress = formatSize(job['bytes'])
+    if job['total']:
+        progress += ' of %s (%d%%)' % (formatSize(job['total']), min(100, job['bytes'] * 100 // job['total']))
+    if job['started']:
+        elapsed = formatDuration((job['finished'] or time.time()) - job['started'])
+    else:
+        elapsed = '-'
+    return '%4d %-8s %-15s %-10s %-28s %9s  %s' % (job['id'], job['type'], job['config'], job['status'], progress, elapsed, target)
+
+def showJobs():
+    jobs = jobStore().jobs()
+    if not jobs:
+        print('No jobs')
+        return
+    print('%4s %-8s %-15s %-10s %-28s %9s  %s' % ('Id', 'Type', 'Config', 'Status', 'Progress', 'Elapsed', 'Dump'))
+    for job in jobs:
+        color = BColors.RED if job['status'] == 'failed' else BColors.GREEN if job['status'] == 'done' else BColors.NC
+        print(color + jobDescription(job) + BColors.NC)
+        if job.get('error'):
+            print(BColors.RED + '     ' + job['error'] + BColors.NC)
+
+def cancelJob():
+    jobs = [job for job in jobStore().jobs() if job['status'] not in FINISHED_STATUSES]
+    if not jobs:
+        print('There are no queued or running jobs')
+        return
+    answers = prompt({
+        'type': 'list',
+        'name': 'job',
+        'message': 'What job do you want to cancel?',
+        'choices': [{'name': jobDescription(job), 'value': job['id']} for job in jobs]
+    }, style=constants.style)
+    if bool(answers):
+        cancelJobById(answers['job'])
+
+def cancelJobById(job_id):
+    def cleanup(job):
+        # A cancelled dump is incomplete, it is removed like a dump that failed
+        if job['type'] == 'dump' and job.get('dumpLocation'):
+            removeDump(job['dumpLocation'])
+    job = jobStore().cancel(job_id, cleanup)
+    if job is None:
+        logError('Job %d is not queued or running' % job_id)
+        return False
+    print('Job %d cancelled' % job_id)
+    return True
+
+def runJob(job_id):
+    store = jobStore()
+    job = store.job(job_id)
+    config = getConfig(job['config'])
+    if not config:
+        store.updateJob(job_id, error="Could not find config '%s'" % job['config'])
+        return False
+    Progress.reporter = lambda progress: store.updateJob(job_id, bytes=progress.bytes, total=progress.total)
+    arguments = job['arguments']
+    if job['type'] == 'dump':
+        store.updateJob(job_id, dumpLocation=dumpLocation(config, arguments['dump']))
+        success = createNamedDump(config, arguments['dump'], subset=arguments.get('subset', False), incremental=arguments.get('incremental', False)) is not None
+    elif job['type'] == 'restore':
+        dump_to_restore = os.path.join(config.dumpFolder, arguments['dump'])
+        with operation(config, 'restore'):
+            clean = arguments.get('tables') is None or arguments.get('clean', False)
+            success = (not clean or recreateDatabase(config)) and restoreDatabase(config, dump_to_restore, arguments.get('fast'), arguments.get('tables'), arguments.get('jobs'))
+    else:
+        success = recreateDatabase(config)
+    if not success:
+        store.updateJob(job_id, error='The %s failed, see %s' % (job['type'], os.path.join(store.folder, WORKER_LOG_FILE)))
+    return success
+
+def confirmDrop(config):
+    answers = prompt({
+        'type': 'confirm',
+        'message': 'Are you sure you want to drop the ' + config.database,
+        'name': 'continue',
+    }, style=constants.style)
+    return bool(answers) and answers['continue']
+
+def cleanDatabase(config):
+    if confirmDrop(config):
+        recreateDatabase(config)
+
+@recorded('clean')
+def recreateDatabase(config):
+    # Dropping a database that does not exist yet fails, only the create decides whether it worked
+    success = False
+    for command in recreateDatabaseCommands(config):
+        success = runPipeline([command], env=clientEnv(config))
+    return success
+
+def dumpFormatChoices(database_type):
+    if database_type == 'mysql':
+        return ['plain', 'directory']
+    return DUMP_FORMATS
+
+def validateOptionalNumber(val):
+    return val == '' or val.isdigit() or 'Please enter a number'
+
+def toOptionalNumber(val):
+    if val is None or val == '':
+        return None
+    return int(val)
 
 def askWhichConfiguration(configs, question):
+    from functional import seq
 
     def getChoiceObject(key, currentConfig):
         if key == currentConfig:
@@ -282,122 +1206,197 @@ def askWhichConfiguration(configs, question):
     return prompt(questions, style=constants.style)
 
 def changeConfig():
-    config_file = getConfigFilePath()
-
-    with open(config_file, 'r') as stream:
-        configs = yaml.safe_load(stream)
-        answers = askWhichConfiguration(configs, 'What configuration do you want to use?')
+    configs = configStore().configs()
+    answers = askWhichConfiguration(configs, 'What configuration do you want to use?')
 
-        if bool(answers):
-            configs[constants.configToUseVarName] = answers['configuration']
-            
-            with open(config_file, 'w') as f:
-                yaml.dump(configs, f)
-        else:
-            exit()
+    if bool(answers):
+        configStore().set(constants.configToUseVarName, answers['configuration'])
+    else:
+        exit()
 
 def removeConfig(config):
-    config_file = getConfigFilePath()
+    configs = configStore().configs()
+    answers = askWhichConfiguration(configs, 'What configuration do you want to remove?')
 
-    with open(config_file, 'r') as stream:
-        configs = yaml.safe_load(stream)
-        answers = askWhichConfiguration(configs, 'What configuration do you want to remove?')
-
-        if bool(answers):
-            del configs[answers['configuration']]
-            
-            with open(config_file, 'w') as f:
-                yaml.dump(configs, f)
+    if bool(answers):
+        configStore().remove(answers['configuration'])
 
 def editConfig():
-    config_file = getConfigFilePath()
-
-    with open(config_file, 'r') as stream:
-        configs = yaml.safe_load(stream)
-        answers = askWhichConfiguration(configs, 'What configuration do you want to edit?')
-
-        if bool(answers):
-            chosen_config = answers['configuration']
-            config_object = extractConfigToUse(chosen_config, configs)
-            questions = [
-                {
-                    'type': 'input',
-                    'name': 'config_key',
-                    'message': 'Configuration key:',
-                    'default': chosen_config
-                },
-                {
-                    'type': 'input',
-                    'name': 'database',
-                    'message': 'Database:',
-                    'default': config_object.database
-                },
-                {
-                    'type': 'list',
-                    'name': 'database_type',
-                    'message': 'Database type:',
-                    'choices': ['mysql', 'postgres'],
-                    'default': config_object.databaseType
-                },
-                {
-                    'type': 'input',
-                    'name': 'dump_folder',
-                    'message': 'Dump folder:',
-                    'default': config_object.dumpFolder,
-                    'validate': lambda val: os.path.isdir(val) or 'Directory does not exist'
-                },
-                {
-                    'type': 'input',
-                    'name': 'database_user',
-                    'message': 'Database user:',
-                    'default': config_object.databaseUser
-                },
-                {
-                    'type': 'input',
-                    'name': 'database_password',
-                    'message': 'Database password:',
-                    'default': config_object.databasePassword
-                },
-                {
-                    'type': 'confirm',
-                    'message': 'Is this a docker configuration',
-                    'name': 'isDocker',
-                    'default': config_object.isDocker,
-                },
-                {
-                    'type': 'input',
-                    'message': 'What is the docker container\'s name?',
-                    'name': 'dockerContainerName',
-                    'default': config_object.dockerContainerName,
-                    'when': lambda answers: answers['isDocker']
-                },
-                {
-                    'type': 'input',
-                    'message': 'On what port is the docker container running?',
-                    'name': 'dockerPort',
-                    'default': config_object.dockerPort,
-                    'when': lambda answers: answers['isDocker']
-                }
-            ]   
-            edited_config = prompt(questions, style=constants.style)
-            if bool(edited_config):
-                new_config = {
-                    'database': edited_config['database'],
-                    'databasePassword': edited_config['database_password'],
-                    'databaseUser': edited_config['database_user'],
-                    'dumpFolder': edited_config['dump_folder'],
-                    'databaseType': edited_config['database_type'],
-                    'isDocker': edited_config['isDocker'],
-                    'dockerContainerName': edited_config['dockerContainerName'],
-                    'dockerPort': edited_config['dockerPort']
-                }
-                configs[chosen_config] = new_config
-
-                with open(config_file, 'w') as f:
-                    yaml.dump(configs, f)
+    configs = configStore().configs()
+    answers = askWhichConfiguration(configs, 'What configuration do you want to edit?')
+
+    if bool(answers):
+        chosen_config = answers['configuration']
+        config_object = extractConfigToUse(chosen_config, configs)
+        questions = [
+            {
+                'type': 'input',
+                'name': 'config_key',
+                'message': 'Configuration key:',
+                'default': chosen_config
+            },
+            {
+                'type': 'input',
+                'name': 'database',
+                'message': 'Database:',
+                'default': config_object.database
+            },
+            {
+                'type': 'list',
+                'name': 'database_type',
+                'message': 'Database type:',
+                'choices': ['mysql', 'postgres'],
+                'default': config_object.databaseType
+            },
+            {
+                'type': 'input',
+                'name': 'dump_folder',
+                'message': 'Dump folder:',
+                'default': config_object.dumpFolder,
+                'validate': lambda val: os.path.isdir(val) or 'Directory does not exist'
+            },
+            {
+                'type': 'input',
+                'name': 'database_user',
+                'message': 'Database user:',
+                'default': config_object.databaseUser
+            },
+            {
+                'type': 'input',
+                'name': 'database_password',
+                'message': 'Database password:',
+                'default': config_object.databasePassword
+            },
+            {
+                'type': 'confirm',
+                'message': 'Is this a docker configuration',
+                'name': 'isDocker',
+                'default': config_object.isDocker,
+            },
+            {
+                'type': 'input',
+                'message': 'What is the docker container\'s name?',
+                'name': 'dockerContainerName',
+                'default': config_object.dockerContainerName,
+                'when': lambda answers: answers['isDocker']
+            },
+            {
+                'type': 'input',
+                'message': 'On what port is the docker container running?',
+                'name': 'dockerPort',
+                'default': config_object.dockerPort,
+                'when': lambda answers: answers['isDocker']
+            },
+            {
+                'type': 'list',
+                'message': 'How should jdump reach the database (exec: through docker exec, tcp: clients on this machine connect to the port, mount: the container reads the dump folder)?',
+                'name': 'dockerTransport',
+                'choices': DOCKER_TRANSPORTS,
+                'default': config_object.dockerTransport,
+                'when': lambda answers: answers['isDocker']
+            },
+            {
+                'type': 'input',
+                'message': 'Where is the dump folder mounted in the container?',
+                'name': 'dockerDumpFolder',
+                'default': config_object.dockerDumpFolder or '',
+                'when': lambda answers: answers['isDocker'] and answers['dockerTransport'] == 'mount'
+            },
+            {
+                'type': 'list',
+                'name': 'compression',
+                'message': 'Compression of the dumps:',
+                'choices': COMPRESSION_TYPES,
+                'default': config_object.compression
+            },
+            {
+                'type': 'input',
+                'name': 'compressionLevel',
+                'message': 'Compression level (leave empty for the default):',
+                'default': str(config_object.compressionLevel or ''),
+                'validate': validateOptionalNumber,
+                'when': lambda answers: answers['compression'] != 'none'
+            },
+            {
+                'type': 'input',
+                'name': 'compressionThreads',
+                'message': 'Compression threads (leave empty for the default):',
+                'default': str(config_object.compressionThreads or ''),
+                'validate': validateOptionalNumber,
+                'when': lambda answers: answers['compression'] != 'none'
+            },
+            {
+                'type': 'list',
+                'name': 'dumpFormat',
+                'message': 'Dump format:',
+                'choices': lambda answers: dumpFormatChoices(answers['database_type']),
+                'default': config_object.dumpFormat
+            },
+            {
+                'type': 'input',
+                'name': 'dumpJobs',
+                'message': 'Number of parallel jobs (leave empty for the default):',
+                'default': str(config_object.dumpJobs or ''),
+                'validate': validateOptionalNumber,
+                'when': lambda answers: answers['dumpFormat'] != 'plain'
+            },
+            {
+                'type': 'list',
+                'name': 'storage',
+                'message': 'Storage of the dumps (dedup stores the parts successive dumps share once):',
+                'choices': STORAGE_TYPES,
+                'default': config_object.storage,
+                'when': lambda answers: answers['dumpFormat'] == 'plain'
+            },
+            {
+                'type': 'confirm',
+                'name': 'incrementalDumps',
+                'message': 'Allow incremental dumps (full dumps record the binlog position or create a replication slot)?',
+                'default': config_object.incrementalDumps,
+                'when': lambda answers: answers['dumpFormat'] == 'plain'
+            },
+            {
+                'type': 'confirm',
+                'name': 'fastRestore',
+                'message': 'Use fast restores (skips foreign key and unique checks, commits once at the end)?',
+                'default': config_object.fastRestore
+            },
+            {
+                'type': 'confirm',
+                'name': 'checkpointRestores',
+                'message': 'Restore table by table and record every finished table, so an interrupted restore can be resumed?',
+                'default': config_object.checkpointRestores
+            }
+        ]   
+        edited_config = prompt(questions, style=constants.style)
+        if bool(edited_config):
+            new_config = {
+                'database': edited_config['database'],
+                'databasePassword': edited_config['database_password'],
+                'databaseUser': edited_config['database_user'],
+                'dumpFolder': edited_config['dump_folder'],
+                'databaseType': edited_config['database_type'],
+                'isDocker': edited_config['isDocker'],
+                'dockerContainerName': edited_config['dockerContainerName'],
+                'dockerPort': edited_config['dockerPort'],
+                'dockerTransport': edited_config.get('dockerTransport', 'exec'),
+                'dockerDumpFolder': edited_config.get('dockerDumpFolder') or None,
+                'compression': edited_config['compression'],
+                'compressionLevel': toOptionalNumber(edited_config.get('compressionLevel')),
+                'compressionThreads': toOptionalNumber(edited_config.get('compressionThreads')),
+                'dumpFormat': edited_config['dumpFormat'],
+                'dumpJobs': toOptionalNumber(edited_config.get('dumpJobs')),
+                'fastRestore': edited_config['fastRestore'],
+                'checkpointRestores': edited_config['checkpointRestores'],
+                'storage': edited_config.get('storage', 'files'),
+                'incrementalDumps': edited_config.get('incrementalDumps', False),
+                # The subset is only edited in config.yml, it is kept as it is
+                'subsetTables': config_object.subsetTables,
+                'subsetSchemaOnly': config_object.subsetSchemaOnly
+            }
+            configStore().set(chosen_config, new_config)
 
 def addConfig():
-    config_file = getConfigFilePath()
     questions = [
         {
             'type': 'input',
@@ -448,26 +1447,104 @@ def addConfig():
             'message': 'On what port is the docker container running?',
             'name': 'dockerPort',
             'when': lambda answers: answers['isDocker']
+        },
+        {
+            'type': 'list',
+            'message': 'How should jdump reach the database (exec: through docker exec, tcp: clients on this machine connect to the port, mount: the container reads the dump folder)?',
+            'name': 'dockerTransport',
+            'choices': DOCKER_TRANSPORTS,
+            'when': lambda answers: answers['isDocker']
+        },
+        {
+            'type': 'input',
+            'message': 'Where is the dump folder mounted in the container?',
+            'name': 'dockerDumpFolder',
+            'when': lambda answers: answers['isDocker'] and answers['dockerTransport'] == 'mount'
+        },
+        {
+            'type': 'list',
+            'name': 'compression',
+            'message': 'Compression of the dumps:',
+            'choices': COMPRESSION_TYPES
+        },
+        {
+            'type': 'input',
+            'name': 'compressionLevel',
+            'message': 'Compression level (leave empty for the default):',
+            'validate': validateOptionalNumber,
+            'when': lambda answers: answers['compression'] != 'none'
+        },
+        {
+            'type': 'input',
+            'name': 'compressionThreads',
+            'message': 'Compression threads (leave empty for the default):',
+            'validate': validateOptionalNumber,
+            'when': lambda answers: answers['compression'] != 'none'
+        },
+        {
+            'type': 'list',
+            'name': 'dumpFormat',
+            'message': 'Dump format:',
+            'choices': lambda answers: dumpFormatChoices(answers['database_type'])
+        },
+        {
+            'type': 'input',
+            'name': 'dumpJobs',
+            'message': 'Number of parallel jobs (leave empty for the default):',
+            'validate': validateOptionalNumber,
+            'when': lambda answers: answers['dumpFormat'] != 'plain'
+        },
+        {
+            'type': 'list',
+            'name': 'storage',
+            'message': 'Storage of the dumps (dedup stores the parts successive dumps share once):',
+            'choices': STORAGE_TYPES,
+            'when': lambda answers: answers['dumpFormat'] == 'plain'
+        },
+        {
+            'type': 'confirm',
+            'name': 'incrementalDumps',
+            'message': 'Allow incremental dumps (full dumps record the binlog position or create a replication slot)?',
+            'default': False,
+            'when': lambda answers: answers['dumpFormat'] == 'plain'
+        },
+        {
+            'type': 'confirm',
+            'name': 'fastRestore',
+            'message': 'Use fast restores (skips foreign key and unique checks, commits once at the end)?',
+            'default': False
+        },
+        {
+            'type': 'confirm',
+            'name': 'checkpointRestores',
+            'message': 'Restore table by table and record every finished table, so an interrupted restore can be resumed?',
+            'default': False
         }
     ]
     answers = prompt(questions, style=constants.style)
     if bool(answers):
-        with open(config_file, 'r') as stream:
-            configs = yaml.safe_load(stream)
-            new_config = {
-                'database': answers['database'],
-                'databasePassword': answers['database_password'],
-                'databaseUser': answers['database_user'],
-                'dumpFolder': answers['dump_folder'],
-                'databaseType': answers['database_type'],
-                'isDocker': answers['isDocker'],
-                'dockerContainerName': answers.get('dockerContainerName'),
-                'dockerPort': answers.get('dockerPort')
-            }
-            configs[answers['config_key']] = new_config
-
-            with open(config_file, 'w') as f:
-                yaml.dump(configs, f)
+        new_config = {
+            'database': answers['database'],
+            'databasePassword': answers['database_password'],
+            'databaseUser': answers['database_user'],
+            'dumpFolder': answers['dump_folder'],
+            'databaseType': answers['database_type'],
+            'isDocker': answers['isDocker'],
+            'dockerContainerName': answers.get('dockerContainerName'),
+            'dockerPort': answers.get('dockerPort'),
+            'dockerTransport': answers.get('dockerTransport', 'exec'),
+            'dockerDumpFolder': answers.get('dockerDumpFolder') or None,
+            'compression': answers['compression'],
+            'compressionLevel': toOptionalNumber(answers.get('compressionLevel')),
+            'compressionThreads': toOptionalNumber(answers.get('compressionThreads')),
+            'dumpFormat': answers['dumpFormat'],
+            'dumpJobs': toOptionalNumber(answers.get('dumpJobs')),
+            'fastRestore': answers['fastRestore'],
+            'checkpointRestores': answers['checkpointRestores'],
+            'storage': answers.get('storage', 'files'),
+            'incrementalDumps': answers.get('incrementalDumps', False)
+        }
+        configStore().set(answers['config_key'], new_config)
     else:
         exit()
 
@@ -486,5 +1563,4 @@ def initConfig():
         if not answers['continue']:
             return
 
-    new_config_file = open(config_file, "w")
-    new_config_file.write(constants.configToUseVarName + ': ')
\ No newline at end of file
+    configStore().save({constants.configToUseVarName: None})
\ No newline at end of file
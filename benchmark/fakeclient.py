@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# Stand-in for mysqldump, mysql, mysqladmin, pg_dump, pg_restore, psql, dropdb, createdb and docker.
+# run.py puts a wrapper per tool on PATH that calls this script with the name of the tool.
+#
+# JDUMP_BENCH_SIZE    bytes a dump command writes (default 1 MB)
+# JDUMP_BENCH_RATE    bytes per second the fake server produces or consumes (default unlimited)
+# JDUMP_BENCH_TABLES  number of tables in a generated dump (default 10)
+
+import os
+import random
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+
+BLOCK_SIZE = 64 * 1024
+ROW_SIZE = 1000
+
+
+class RateLimit:
+
+    def __init__(self):
+        rate = os.environ.get('JDUMP_BENCH_RATE')
+        self.rate = float(rate) if rate else None
+        self.started = time.monotonic()
+        self.bytes = 0
+
+    def wait(self, count):
+        self.bytes += count
+        if self.rate:
+            ahead = self.bytes / self.rate - (time.monotonic() - self.started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def dumpSize():
+    return int(os.environ.get('JDUMP_BENCH_SIZE', 1024 * 1024))
+
+def tableCount():
+    return int(os.environ.get('JDUMP_BENCH_TABLES', 10))
+
+def payloads():
+    # Rows differ from each other but the dump is the same for every run, so runs can be compared
+    generator = random.Random(42)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789'
+    text = ''.join(generator.choice(alphabet) for _ in range(64 * 1024))
+    return lambda row: text[row * 7 % (len(text) - ROW_SIZE):][:ROW_SIZE - 40]
+
+def writeDump(header, table_header, row, table_footer, footer, names=None):
+    names = names or ['table_%02d' % table for table in range(tableCount())]
+    # A dump of some of the tables holds their share of the size
+    size = dumpSize() * len(names) // tableCount()
+    tables = len(names)
+    payload = payloads()
+    limit = RateLimit()
+    out = sys.stdout.buffer
+    buffer = [header]
+    buffered = len(header)
+    written = len(header)
+    table_size = max(1, size // tables)
+    row_id = 0
+    for name in names:
+        buffer.append(table_header(name))
+        table_written = 0
+        while table_written < table_size and written < size:
+            line = row(name, row_id, payload(row_id))
+            row_id += 1
+            buffer.append(line)
+            buffered += len(line)
+            table_written += len(line)
+            written += len(line)
+            if buffered >= BLOCK_SIZE:
+                data = ''.join(buffer).encode('utf-8')
+                out.write(data)
+                limit.wait(len(data))
+                buffer = []
+                buffered = 0
+        buffer.append(table_footer(name))
+    buffer.append(footer)
+    data = ''.join(buffer).encode('utf-8')
+    out.write(data)
+    limit.wait(len(data))
+    out.flush()
+
+def mysqldump(arguments):
+    if '--no-data' in arguments:
+        # The routines of a directory dump, the fake database has none
+        sys.stdout.write('-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)\n\n-- Dump completed\n')
+        return
+    writeDump(
+        '-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)\n/*!40101 SET NAMES utf8mb4 */;\n\n',
+        lambda name: '--\n-- Table structure for table `%s`\n--\n\nDROP TABLE IF EXISTS `%s`;\nCREATE TABLE `%s` (id int, value text);\n\n--\n-- Dumping data for table `%s`\n--\n\n' % (name, name, name, name),
+        lambda name, row_id, payload: "INSERT INTO `%s` VALUES (%d,'%s');\n" % (name, row_id, payload),
+        lambda name: '\n',
+        '/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;\n\n-- Dump completed\n',
+        # Directory dumps name their tables after the database
+        [argument for argument in arguments if argument.startswith('table_')]
+    )
+
+def pgDump(arguments):
+    if '-Fd' in arguments:
+        # Directory archives are written by the server itself, a single file stands in for the table data
+        output = arguments[arguments.index('-f') + 1]
+        os.makedirs(output, exist_ok=True)
+        with open(os.path.join(output, 'toc.dat'), 'wb') as toc:
+            toc.write(b'PGDMP')
+        with open(os.path.join(output, '1000.dat'), 'wb') as data:
+            writeDumpTo(data)
+        return
+    writeDump(
+        '--\n-- PostgreSQL database dump\n--\n\nSET statement_timeout = 0;\n\n',
+        lambda name: '--\n-- Name: %s; Type: TABLE; Schema: public; Owner: postgres\n--\n\nCREATE TABLE public.%s (id integer, value text);\n\n--\n-- Data for Name: %s; Type: TABLE DATA; Schema: public; Owner: postgres\n--\n\nCOPY public.%s (id, value) FROM stdin;\n' % (name, name, name, name),
+        lambda name, row_id, payload: '%d\t%s\n' % (row_id, payload),
+        lambda name: '\\.\n\n',
+        '--\n-- PostgreSQL database dump complete\n--\n\n'
+    )
+
+def writeDumpTo(stream):
+    limit = RateLimit()
+    remaining = dumpSize()
+    block = payloads()(0).encode('utf-8') * (BLOCK_SIZE // ROW_SIZE + 1)
+    while remaining > 0:
+        data = block[:min(BLOCK_SIZE, remaining)]
+        stream.write(data)
+        limit.wait(len(data))
+        remaining -= len(data)
+
+def consume(stream):
+    limit = RateLimit()
+    for data in iter(lambda: stream.read(BLOCK_SIZE), b''):
+        limit.wait(len(data))
+
+def mysql(arguments):
+    if '-e' in arguments:
+        query = arguments[arguments.index('-e') + 1]
+        if 'information_schema.tables' in query:
+            size = dumpSize() // tableCount()
+            for table in range(tableCount()):
+                print('table_%02d\tBASE TABLE\t%d' % (table, size))
+        elif query.startswith('SHOW FULL TABLES'):
+            for table in range(tableCount()):
+                print('table_%02d\tBASE TABLE' % table)
+        return
+    consume(sys.stdin.buffer)
+
+def psql(arguments):
+    consume(sys.stdin.buffer)
+
+def pgRestore(arguments):
+    path = arguments[-1]
+    if os.path.isdir(path):
+        for file in sorted(os.listdir(path)):
+            with open(os.path.join(path, file), 'rb') as f:
+                consume(f)
+    else:
+        with open(path, 'rb') as f:
+            consume(f)
+
+def docker(arguments):
+    # The container is this machine: exec runs the command here, cp copies between local paths
+    if arguments[0] == 'exec':
+        arguments = [argument for argument in arguments[1:] if argument != '-i'][1:]
+        sys.exit(subprocess.call(arguments))
+    if arguments[0] == 'cp':
+        source, target = [argument.split(':', 1)[1] if ':' in argument and not argument.startswith('/') else argument for argument in arguments[1:3]]
+        if os.path.isdir(source):
+            shutil.copytree(source, target, dirs_exist_ok=True)
+        else:
+            shutil.copyfile(source, target)
+
+def noop(arguments):
+    pass
+
+TOOLS = {
+    'mysqldump': mysqldump,
+    'mysql': mysql,
+    'mysqladmin': noop,
+    'pg_dump': pgDump,
+    'pg_restore': pgRestore,
+    'psql': psql,
+    'dropdb': noop,
+    'createdb': noop,
+    'docker': docker
+}
+
+if __name__ == '__main__':
+    tool = sys.argv[1]
+    arguments = sys.argv[2:]
+    if tool not in TOOLS:
+        sys.stderr.write('fakeclient: unknown tool %s %s\n' % (tool, shlex.join(arguments)))
+        sys.exit(1)
+    TOOLS[tool](arguments)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# Times the dump, restore, clean and list commands of jdump end to end against fake database clients, see README.MD
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_FOLDER = os.path.dirname(BENCHMARK_FOLDER)
+TOOLS = ['mysqldump', 'mysql', 'mysqladmin', 'pg_dump', 'pg_restore', 'psql', 'dropdb', 'createdb', 'docker']
+RESULTS_VERSION = 1
+MB = 1024 * 1024
+
+
+def buildParser():
+    parser = argparse.ArgumentParser(description='Benchmark jdump offline, the database clients are replaced by benchmark/fakeclient.py')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 64], help='Dump sizes in MB')
+    parser.add_argument('--folder-dumps', type=int, nargs='+', default=[100, 1000, 10000], help='Number of dumps in the dump folder when listing')
+    parser.add_argument('--database-types', nargs='+', default=['mysql', 'postgres'], choices=['mysql', 'postgres'])
+    parser.add_argument('--compressions', nargs='+', default=['none', 'gzip', 'zstd'], choices=['none', 'gzip', 'zstd'])
+    parser.add_argument('--formats', nargs='+', default=['plain', 'directory', 'custom', 'dedup'], choices=['plain', 'directory', 'custom', 'dedup'],
+                        help='Dump formats, directory dumps MySQL table by table, custom is PostgreSQL only and dedup stores plain dumps as chunks')
+    parser.add_argument('--docker', action='store_true', help='Also run every scenario through the docker configuration')
+    parser.add_argument('--rate', type=float, help='MB per second the fake servers produce and consume, unlimited by default')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the median is reported')
+    parser.add_argument('--output', default='benchmark-results.json', help='File the results are written to')
+    parser.add_argument('--compare', help='Results of an earlier run to compare with')
+    parser.add_argument('--python', default=sys.executable, help='Interpreter that runs jdump')
+    return parser
+
+def createFakeTools(bin_folder, python):
+    fake_client = os.path.join(BENCHMARK_FOLDER, 'fakeclient.py')
+    for tool in TOOLS:
+        path = os.path.join(bin_folder, tool)
+        with open(path, 'w') as f:
+            f.write('#!/bin/sh\nexec "%s" "%s" %s "$@"\n' % (python, fake_client, tool))
+        os.chmod(path, 0o755)
+
+def configKey(database_type, compression, docker, dump_format):
+    return '%s_%s%s%s' % (database_type, compression, '' if dump_format == 'plain' else '_' + dump_format, '_docker' if docker else '')
+
+def buildScenarios(arguments, compressions):
+    scenarios = []
+    for database_type in arguments.database_types:
+        for dump_format in arguments.formats:
+            if dump_format == 'custom' and database_type != 'postgres':
+                continue
+            # pg_dump writes custom and directory dumps itself, the compression of the configuration does not change them
+            format_compressions = compressions[:1] if database_type == 'postgres' and dump_format in ['directory', 'custom'] else compressions
+            for compression in format_compressions:
+                for docker in ([False, True] if arguments.docker else [False]):
+                    scenarios.append((database_type, compression, docker, dump_format))
+    return scenarios
+
+def writeConfig(work_folder, dump_folder, scenarios):
+    # Written by hand, the harness itself should not need PyYAML
+    lines = ['configToUse: %s' % configKey(*scenarios[0])]
+    for database_type, compression, docker, dump_format in scenarios:
+        lines.append('%s:' % configKey(database_type, compression, docker, dump_format))
+        lines.append('  database: bench')
+        lines.append('  databaseType: %s' % database_type)
+        lines.append('  databaseUser: bench')
+        lines.append('  databasePassword: bench')
+        lines.append('  dumpFolder: %s' % dump_folder)
+        lines.append('  compression: %s' % compression)
+        if dump_format == 'dedup':
+            lines.append('  dumpFormat: plain')
+            lines.append('  storage: dedup')
+        else:
+            lines.append('  dumpFormat: %s' % dump_format)
+        if dump_format in ['directory', 'custom']:
+            lines.append('  dumpJobs: 4')
+        if docker:
+            lines.append('  isDocker: true')
+            lines.append('  dockerContainerName: bench')
+    with open(os.path.join(work_folder, 'config.yml'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def timeCommand(python, work_folder, arguments, env):
+    started = time.perf_counter()
+    result = subprocess.run([python, os.path.join(work_folder, 'jdump.py')] + arguments, cwd=work_folder, env=env,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started, result.returncode == 0
+
+def measure(repeat, run):
+    runs = []
+    success = True
+    for _ in range(repeat):
+        seconds, run_success = run()
+        runs.append(seconds)
+        success = success and run_success
+    return {
+        'seconds': statistics.median(runs),
+        'min': min(runs),
+        'max': max(runs),
+        'runs': runs,
+        'success': success
+    }
+
+def result(operation, measurement, **details):
+    values = {
+        'operation': operation,
+        'databaseType': None,
+        'compression': None,
+        'docker': False,
+        'dumpFormat': None,
+        'bytes': None,
+        'dumps': None
+    }
+    values.update(details)
+    values.update(measurement)
+    values['throughput'] = values['bytes'] / values['seconds'] if values['bytes'] and values['seconds'] > 0 else None
+    return values
+
+def findDump(dump_folder, dump_name):
+    for file in os.listdir(dump_folder):
+        if file.startswith(dump_name + '_'):
+            return file
+    return None
+
+def removeDumps(dump_folder):
+    for file in os.listdir(dump_folder):
+        path = os.path.join(dump_folder, file)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+def benchmarkStartup(arguments, work_folder, env):
+    sys.path.insert(0, REPOSITORY_FOLDER)
+    import constants
+    results = []
+    for name, command in [('startup help', ['--help']), ('startup config show', ['config', 'show'])]:
+        measurement = measure(max(arguments.repeat, 5), lambda: timeCommand(arguments.python, work_folder, command, env))
+        startup = result(name, measurement)
+        startup['target'] = constants.startupTimeTarget
+        startup['withinTarget'] = startup['seconds'] <= constants.startupTimeTarget
+        results.append(startup)
+    return results
+
+def benchmarkDumps(arguments, work_folder, dump_folder, env, scenarios):
+    results = []
+    for database_type, compression, docker, dump_format in scenarios:
+        key = configKey(database_type, compression, docker, dump_format)
+        details = {'databaseType': database_type, 'compression': compression, 'docker': docker, 'dumpFormat': dump_format}
+        for size in arguments.sizes:
+            env['JDUMP_BENCH_SIZE'] = str(size * MB)
+            dumps = []
+
+            def dump():
+                dump_name = 'bench-%s-%d' % (key, len(dumps))
+                timing = timeCommand(arguments.python, work_folder, ['dump', '--config', key, '--dump', dump_name], env)
+                dumps.append(findDump(dump_folder, dump_name))
+                return timing
+
+            results.append(result('dump', measure(arguments.repeat, dump), bytes=size * MB, **details))
+            dump_file = dumps[-1]
+            if dump_file is None:
+                print('%s: dumping failed, skipping the restore' % key)
+                continue
+            results.append(result('restore', measure(arguments.repeat, lambda: timeCommand(arguments.python, work_folder, ['restore', '--config', key, '--dump', dump_file], env)), bytes=size * MB, **details))
+            removeDumps(dump_folder)
+        results.append(result('clean', measure(arguments.repeat, lambda: timeCommand(arguments.python, work_folder, ['clean', '--config', key], env)), **details))
+    return results
+
+def benchmarkList(arguments, work_folder, dump_folder, env):
+    results = []
+    for count in arguments.folder_dumps:
+        removeDumps(dump_folder)
+        for index in range(count):
+            with open(os.path.join(dump_folder, 'bench-%05d_Jan-01-2026.sql' % index), 'w') as f:
+                f.write('-- fake dump %d\n' % index)
+        catalog = os.path.join(dump_folder, '.jdump_catalog.json')
+
+        def coldList():
+            # Without the catalog every dump in the folder is inspected
+            if os.path.exists(catalog):
+                os.remove(catalog)
+            return timeCommand(arguments.python, work_folder, ['list'], env)
+
+        results.append(result('list cold', measure(arguments.repeat, coldList), dumps=count))
+        results.append(result('list warm', measure(arguments.repeat, lambda: timeCommand(arguments.python, work_folder, ['list'], env)), dumps=count))
+    removeDumps(dump_folder)
+    return results
+
+def resultKey(values):
+    return values['operation'], values['databaseType'], values['compression'], values['docker'], values.get('dumpFormat'), values['bytes'], values['dumps']
+
+def describe(values):
+    parts = [values['operation']]
+    if values['databaseType']:
+        dump_format = values.get('dumpFormat')
+        parts.append('%s/%s%s%s' % (values['databaseType'], values['compression'], '/' + dump_format if dump_format and dump_format != 'plain' else '', '/docker' if values['docker'] else ''))
+    if values['bytes']:
+        parts.append('%d MB' % (values['bytes'] // MB))
+    if values['dumps']:
+        parts.append('%d dumps' % values['dumps'])
+    return ' '.join(parts)
+
+def printResults(results, previous=None):
+    previous_results = {resultKey(values): values for values in (previous or {}).get('results', [])}
+    for values in results:
+        line = '%-40s %8.3fs' % (describe(values), values['seconds'])
+        if values['throughput']:
+            line += ' %8.1f MB/s' % (values['throughput'] / MB)
+        if not values['success']:
+            line += ' FAILED'
+        if 'withinTarget' in values and not values['withinTarget']:
+            line += ' (target %.3fs)' % values['target']
+        earlier = previous_results.get(resultKey(values))
+        if earlier:
+            line += ' %+6.1f%%' % ((values['seconds'] - earlier['seconds']) * 100 / earlier['seconds'])
+        print(line)
+
+def main():
+    arguments = buildParser().parse_args()
+    # Compression runs on the real tools, only the database clients are faked
+    compressions = [compression for compression in arguments.compressions
+                    if compression == 'none' or shutil.which('zstd' if compression == 'zstd' else 'gzip')]
+    scenarios = buildScenarios(arguments, compressions)
+    work_folder = tempfile.mkdtemp(prefix='jdump-benchmark-')
+    try:
+        bin_folder = os.path.join(work_folder, 'bin')
+        dump_folder = os.path.join(work_folder, 'dumps')
+        os.makedirs(bin_folder)
+        os.makedirs(dump_folder)
+        createFakeTools(bin_folder, arguments.python)
+        writeConfig(work_folder, dump_folder, scenarios)
+        # jdump finds config.yml next to the script it was started as
+        os.symlink(os.path.join(REPOSITORY_FOLDER, 'jdump.py'), os.path.join(work_folder, 'jdump.py'))
+        env = os.environ.copy()
+        env['PATH'] = bin_folder + os.pathsep + env.get('PATH', '')
+        if arguments.rate:
+            env['JDUMP_BENCH_RATE'] = str(arguments.rate * MB)
+        results = benchmarkStartup(arguments, work_folder, env)
+        results += benchmarkDumps(arguments, work_folder, dump_folder, env, scenarios)
+        results += benchmarkList(arguments, work_folder, dump_folder, env)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+    previous = None
+    if arguments.compare:
+        with open(arguments.compare, 'r') as f:
+            previous = json.load(f)
+    printResults(results, previous)
+    commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPOSITORY_FOLDER, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    with open(arguments.output, 'w') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'started': datetime.datetime.now().isoformat(),
+            'commit': commit.stdout.decode('utf-8').strip() or None,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rate': arguments.rate,
+            'results': results
+        }, f, indent=2)
+    print('Results written to %s' % arguments.output)
+    failed = [values for values in results if not values['success']]
+    slow = [values for values in results if values.get('withinTarget') is False]
+    for values in slow:
+        print('%s took %.3fs, more than startupTimeTarget (%.3fs)' % (describe(values), values['seconds'], values['target']))
+    return 1 if failed or slow else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
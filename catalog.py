@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from chunks import readManifest
+from commands import compressionOf, dumpFormatOf
+
+CATALOG_FILE = '.jdump_catalog.json'
+CATALOG_VERSION = 1
+# Dumps of several configurations can run at once and share a dump folder, their updates must not overwrite each other.
+# The threads of one process share this lock, the menu, the CLI and the jobs worker lock the file next to the catalog.
+CATALOG_LOCK = threading.RLock()
+
+
+def catalogPath(dump_folder):
+    return os.path.join(dump_folder, CATALOG_FILE)
+
+@contextmanager
+def catalogLock(dump_folder):
+    with CATALOG_LOCK:
+        try:
+            lock_file = open(catalogPath(dump_folder) + '.lock', 'w') if fcntl is not None else None
+        except OSError:
+            # A dump folder that can not be written to gets no catalog written either
+            lock_file = None
+        if lock_file is None:
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def loadCatalog(dump_folder):
+    try:
+        with open(catalogPath(dump_folder), 'r') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if catalog.get('version') != CATALOG_VERSION:
+        return {}
+    return catalog
+
+def readOrphanedSnapshots(dump_folder):
+    # Snapshots of dumps that changed or were removed, they are still on the database server until they are dropped
+    return loadCatalog(dump_folder).get('orphanedSnapshots', [])
+
+def writeCatalog(dump_folder, entries, orphaned_snapshots=None):
+    if orphaned_snapshots is None:
+        orphaned_snapshots = readOrphanedSnapshots(dump_folder)
+    # Write to a temporary file and rename it, a concurrent reader never sees a half written catalog.
+    # A dump folder that can not be written to is only listed, the catalog is built again every time.
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=CATALOG_FILE, dir=dump_folder)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': CATALOG_VERSION, 'dumps': entries, 'orphanedSnapshots': orphaned_snapshots}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, catalogPath(dump_folder))
+    except OSError:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def directorySize(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            size += os.path.getsize(os.path.join(root, file))
+    return size
+
+def refreshCatalog(dump_folder):
+    with catalogLock(dump_folder):
+        return refreshEntries(dump_folder)
+
+def orphanSnapshots(entry):
+    return [dict(snapshot, config=config_id) for config_id, snapshot in entry.get('snapshots', {}).items()]
+
+def refreshEntries(dump_folder):
+    catalog = loadCatalog(dump_folder)
+    entries = catalog.get('dumps', {})
+    orphaned_snapshots = list(catalog.get('orphanedSnapshots', []))
+    refreshed = {}
+    changed = False
+    with os.scandir(dump_folder) as scan:
+        for dir_entry in scan:
+            if dir_entry.name.startswith('.'):
+                continue
+            stat = dir_entry.stat()
+            entry = entries.get(dir_entry.name)
+            # Unchanged files keep their entry, only new or modified dumps are inspected again
+            if entry and entry['mtime'] == stat.st_mtime:
+                refreshed[dir_entry.name] = entry
+                continue
+            dump_format = dumpFormatOf(dir_entry.path)
+            if dump_format is None:
+                continue
+            entry = dict(entry or {})
+            if entry:
+                # The dump changed after it was recorded, the old checksum, snapshots, digests and chain no longer apply
+                entry['checksum'] = None
+                orphaned_snapshots += orphanSnapshots(entry)
+                entry.pop('snapshots', None)
+                entry.pop('digests', None)
+                entry.pop('chain', None)
+            entry.update({
+                'name': dir_entry.name,
+                'mtime': stat.st_mtime,
+                'created': entry.get('created', stat.st_ctime),
+                'size': directorySize(dir_entry.path) if dir_entry.is_dir() else stat.st_size,
+                'format': dump_format,
+                'compression': compressionOf(dir_entry.name)
+            })
+            if dump_format == 'dedup':
+                # The manifest only lists the chunks, the dump itself is as large as the chunks it lists
+                manifest = readManifest(dir_entry.path)
+                entry.update({
+                    'size': manifest['size'],
+                    'physicalSize': manifest['storedSize'],
+                    'compression': manifest['compression']
+                })
+            refreshed[dir_entry.name] = entry
+            changed = True
+    for name, entry in entries.items():
+        if name not in refreshed:
+            orphaned_snapshots += orphanSnapshots(entry)
+    if changed or len(refreshed) != len(entries):
+        writeCatalog(dump_folder, refreshed, orphaned_snapshots)
+    return refreshed
+
+def recordDump(config, dump_location, created, duration, checksum=None, subset=None, chain=None):
+    dump_folder = os.path.dirname(os.path.abspath(dump_location))
+    updateDump(dump_folder, os.path.basename(dump_location),
+               created=created,
+               config=config.config_id,
+               databaseType=config.databaseType,
+               duration=duration,
+               checksum=checksum,
+               subset=subset,
+               chain=chain)
+
+def updateDump(dump_folder, name, **values):
+    with catalogLock(dump_folder):
+        entries = refreshEntries(dump_folder)
+        if name not in entries:
+            return
+        entries[name].update(values)
+        writeCatalog(dump_folder, entries)
+
+def forgetOrphanedSnapshots(dump_folder, databases):
+    with catalogLock(dump_folder):
+        entries = refreshEntries(dump_folder)
+        writeCatalog(dump_folder, entries, [snapshot for snapshot in readOrphanedSnapshots(dump_folder) if snapshot['database'] not in databases])
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CHECKPOINTS_FILE = '.jdump_restores.json'
+CHECKPOINTS_VERSION = 1
+PRE_STEP = 'pre'
+POST_STEP = 'post'
+OBJECTS_STEP = 'objects'
+
+
+def tableStep(name):
+    return 'table:%s' % name
+
+def dumpStat(dump_file):
+    # A directory dump changes when a table file is replaced, the newest file stands for the whole dump
+    if os.path.isdir(dump_file):
+        stats = [os.stat(os.path.join(root, file)) for root, _, files in os.walk(dump_file) for file in files]
+        return sum(stat.st_size for stat in stats), max([stat.st_mtime for stat in stats] or [0])
+    stat = os.stat(dump_file)
+    return stat.st_size, stat.st_mtime
+
+
+class CheckpointStore:
+    # The interrupted restore of every configuration, next to config.yml like the jobs and the history
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, CHECKPOINTS_FILE)
+
+    @contextmanager
+    def lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            if state.get('version') == CHECKPOINTS_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'version': CHECKPOINTS_VERSION, 'restores': {}}
+
+    def write(self, state):
+        fd, tmp_path = tempfile.mkstemp(prefix=CHECKPOINTS_FILE, dir=self.folder)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, indent=1)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @contextmanager
+    def update(self):
+        with self.lock():
+            state = self.read()
+            yield state
+            self.write(state)
+
+    def restore(self, config_id):
+        return self.read()['restores'].get(str(config_id))
+
+    def start(self, config_id, dump_file, fast, jobs):
+        size, mtime = dumpStat(dump_file)
+        restore = {
+            'dump': os.path.abspath(dump_file),
+            'dumpSize': size,
+            'dumpMtime': mtime,
+            'fast': fast,
+            'jobs': jobs,
+            'started': time.time(),
+            'updated': time.time(),
+            'done': []
+        }
+        with self.update() as state:
+            state['restores'][str(config_id)] = restore
+        return restore
+
+    def complete(self, config_id, step):
+        with self.update() as state:
+            restore = state['restores'].get(str(config_id))
+            if restore is not None and step not in restore['done']:
+                restore['done'].append(step)
+                restore['updated'] = time.time()
+
+    def finish(self, config_id):
+        with self.update() as state:
+            state['restores'].pop(str(config_id), None)
+
+
+class Checkpoint:
+    # Handed to the restore of a dump, the restore skips the steps that are done and reports every step it finishes.
+    # A resumed restore may find the rows of a step that was interrupted after they were committed.
+
+    def __init__(self, store, config_id, done=(), resumed=False):
+        self.store = store
+        self.config_id = config_id
+        self.done = set(done)
+        self.resumed = resumed
+        self.lock = threading.Lock()
+
+    def isDone(self, step):
+        return step in self.done
+
+    def complete(self, step):
+        # Tables restore on several threads, every thread reports to the same state file
+        with self.lock:
+            self.done.add(step)
+            self.store.complete(self.config_id, step)
+
+
+def isUnchanged(restore):
+    if not os.path.exists(restore['dump']):
+        return False
+    return dumpStat(restore['dump']) == (restore['dumpSize'], restore['dumpMtime'])
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+
+CHUNKS_FOLDER = '.jdump_chunks'
+MANIFEST_EXTENSION = '.jdm'
+MANIFEST_VERSION = 1
+AVERAGE_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+# Chunks younger than this are never collected, a running dump may not have written its manifest yet
+GC_GRACE_SECONDS = 24 * 60 * 60
+
+
+def chunksFolder(dump_folder):
+    return os.path.join(dump_folder, CHUNKS_FOLDER)
+
+def chunkPath(dump_folder, digest):
+    return os.path.join(chunksFolder(dump_folder), digest[:2], digest)
+
+def writeAtomically(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def isBoundary(line):
+    # Content defined: whether a line ends a chunk only depends on the line itself, so the chunks after the lines
+    # that changed are found again. pg_dump writes a row per line and an insert changes one chunk, mysqldump packs
+    # rows into INSERT lines by size and an insert changes every later INSERT line, and chunk, of its table.
+    # Longer lines are proportionally more likely to end a chunk, chunks average AVERAGE_CHUNK_SIZE bytes.
+    return zlib.crc32(line) * AVERAGE_CHUNK_SIZE < len(line) * 0xFFFFFFFF
+
+
+class ChunkWriter:
+
+    def __init__(self, dump_folder, compression_level=None):
+        self.dump_folder = dump_folder
+        self.compression_level = compression_level
+        self.chunks = []
+        self.size = 0
+        self.stored_size = 0
+        self.pending = b''
+        self.lines = []
+        self.lines_size = 0
+
+    def write(self, data):
+        lines = (self.pending + data).split(b'\n')
+        self.pending = lines.pop()
+        for line in lines:
+            line += b'\n'
+            self.lines.append(line)
+            self.lines_size += len(line)
+            if isBoundary(line) or self.lines_size >= MAX_CHUNK_SIZE:
+                self.flushChunk()
+
+    def flushChunk(self):
+        data = b''.join(self.lines)
+        self.lines = []
+        self.lines_size = 0
+        if not data:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        path = chunkPath(self.dump_folder, digest)
+        if os.path.exists(path):
+            # Refresh the chunk so garbage collection does not take it before this manifest is written
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stored = zlib.compress(data, self.compression_level) if self.compression_level is not None else data
+            writeAtomically(path, stored)
+            self.stored_size += len(stored)
+        self.chunks.append([digest, len(data)])
+        self.size += len(data)
+
+    def close(self, manifest_path):
+        if self.pending:
+            self.lines.append(self.pending)
+            self.pending = b''
+        self.flushChunk()
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'compression': 'zlib' if self.compression_level is not None else 'none',
+            'size': self.size,
+            'storedSize': self.stored_size,
+            'chunks': self.chunks
+        }
+        writeAtomically(manifest_path, json.dumps(manifest).encode('utf-8'))
+
+
+class ChunkReader:
+
+    def __init__(self, manifest_path, start=0, end=None):
+        self.dump_folder = os.path.dirname(os.path.abspath(manifest_path))
+        self.manifest = readManifest(manifest_path)
+        self.remaining = iter(self.manifest['chunks'])
+        # Byte range of the dump to read, chunks outside it are skipped without being read
+        self.position = 0
+        self.start = start
+        self.end = end
+
+    def read(self, size=-1):
+        # Hands out one chunk per call, the size is only a hint
+        for digest, chunk_size in self.remaining:
+            chunk_start = self.position
+            self.position += chunk_size
+            if self.position <= self.start:
+                continue
+            if self.end is not None and chunk_start >= self.end:
+                break
+            with open(chunkPath(self.dump_folder, digest), 'rb') as f:
+                data = f.read()
+            if self.manifest['compression'] == 'zlib':
+                data = zlib.decompress(data)
+            return data[max(0, self.start - chunk_start):None if self.end is None else self.end - chunk_start]
+        return b''
+
+    def close(self):
+        pass
+
+def readManifest(manifest_path):
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def compressionLevel(config):
+    if config.compression == 'none':
+        return None
+    return min(9, int(config.compressionLevel or 6))
+
+def collectGarbage(dump_folder):
+    referenced = set()
+    for file in os.listdir(dump_folder):
+        if file.endswith(MANIFEST_EXTENSION):
+            referenced.update(digest for digest, _ in readManifest(os.path.join(dump_folder, file))['chunks'])
+    removed_chunks = 0
+    removed_size = 0
+    now = time.time()
+    for root, _, files in os.walk(chunksFolder(dump_folder)):
+        for file in files:
+            path = os.path.join(root, file)
+            stat = os.stat(path)
+            if file in referenced or now - stat.st_mtime < GC_GRACE_SECONDS:
+                continue
+            os.remove(path)
+            removed_chunks += 1
+            removed_size += stat.st_size
+    return removed_chunks, removed_size
+
+def chunkStoreSize(dump_folder):
+    size = 0
+    for root, _, files in os.walk(chunksFolder(dump_folder)):
+        for file in files:
+            size += os.path.getsize(os.path.join(root, file))
+    return size
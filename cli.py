@@ -0,0 +1,191 @@
+import argparse
+import os
+
+import constants
+
+
+def positiveInt(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: '%s'" % value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('must be at least 1, got %d' % number)
+    return number
+
+def addConfigArgument(parser):
+    parser.add_argument('--config', help='Configuration to use, defaults to the current configuration')
+
+def addBackgroundArgument(parser):
+    parser.add_argument('--background', action='store_true', help='Queue the command as a background job and return immediately')
+
+def buildParser():
+    parser = argparse.ArgumentParser(prog='jdump', description='Manage MySQL and PostgreSQL database dumps. Starts the interactive menu when no command is given.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    dump = subparsers.add_parser('dump', help='Create a dump')
+    addConfigArgument(dump)
+    dump.add_argument('--dump', required=True, help='Name of the dump, it is affixed by the current date and extension')
+    dump_kind = dump.add_mutually_exclusive_group()
+    dump_kind.add_argument('--subset', action='store_true', help='Only dump the rows subsetTables of the configuration keeps, and no rows of its subsetSchemaOnly tables')
+    dump_kind.add_argument('--incremental', action='store_true', help='Only dump the changes since the last dump of the chain, needs incrementalDumps in the configuration')
+    addBackgroundArgument(dump)
+
+    dump_all = subparsers.add_parser('dump-all', help='Create a dump of several configurations concurrently')
+    dump_all.add_argument('--dump', required=True, help='Name of the dumps, they are affixed by the configuration, the current date and extension')
+    dump_all.add_argument('--configs', nargs='+', help='Configurations to dump, defaults to all configurations')
+    dump_all.add_argument('--per-host', type=positiveInt, default=constants.dumpsPerHost, help='Dumps running at once against the same database server')
+
+    restore = subparsers.add_parser('restore', help='Drop the database and restore a dump')
+    addConfigArgument(restore)
+    restore.add_argument('--dump', required=True, help='Dump in the dump folder (or path to a dump) to restore')
+    restore.add_argument('--fast', action='store_true', default=None, help='Skip foreign key and unique checks and commit once, overrides fastRestore of the configuration')
+    restore.add_argument('--tables', nargs='+', help='Only restore these tables, the other tables are kept unless --clean is given')
+    restore.add_argument('--clean', action='store_true', help='Make the database empty before restoring --tables, a full restore always does')
+    restore.add_argument('--jobs', type=positiveInt, help='Number of concurrent sessions, plain dumps are restored by table when this is more than one')
+    addBackgroundArgument(restore)
+
+    resume = subparsers.add_parser('resume', help='Resume the interrupted checkpointed restore of the configuration without cleaning the database')
+    addConfigArgument(resume)
+
+    copy = subparsers.add_parser('copy', help='Drop the database of another configuration and copy the database into it without writing a dump')
+    addConfigArgument(copy)
+    copy.add_argument('--to', required=True, help='Configuration to copy the database to, of the same database type')
+    copy.add_argument('--dump', help='Also keep a compressed dump of the copy with this name in the dump folder')
+
+    clean = subparsers.add_parser('clean', help='Drop the database and create it again, empty')
+    addConfigArgument(clean)
+    addBackgroundArgument(clean)
+
+    list_dumps = subparsers.add_parser('list', help='List the dumps in the dump folder')
+    addConfigArgument(list_dumps)
+    list_dumps.add_argument('--dump', help='Only list dumps whose name contains this text')
+    list_dumps.add_argument('--sort', default=constants.defaultDumpSort, choices=constants.dumpSortNames)
+
+    compare = subparsers.add_parser('compare', help='Compare the schema and data of every table of two plain dumps, exits with 1 when they differ')
+    addConfigArgument(compare)
+    compare.add_argument('--dump', required=True, help='Dump in the dump folder to compare')
+    compare.add_argument('--other', required=True, help='Dump in the dump folder to compare it with')
+    compare.add_argument('--rows', action='store_true', help='Count the rows of every table as well')
+
+    snapshot = subparsers.add_parser('snapshot', help='Restore a dump and keep a snapshot of it, later restores of the dump copy the snapshot')
+    addConfigArgument(snapshot)
+    snapshot.add_argument('--dump', required=True, help='Dump in the dump folder to snapshot')
+
+    index = subparsers.add_parser('index', help='Index the tables of a plain dump and list them')
+    addConfigArgument(index)
+    index.add_argument('--dump', required=True, help='Dump in the dump folder to index')
+
+    gc = subparsers.add_parser('gc', help='Remove the chunks no deduplicated dump uses anymore')
+    addConfigArgument(gc)
+
+    jobs = subparsers.add_parser('jobs', help='Background job commands')
+    jobs_subparsers = jobs.add_subparsers(dest='jobs_command')
+    jobs_subparsers.required = True
+    jobs_subparsers.add_parser('list', help='List the queued, running and finished jobs')
+    cancel = jobs_subparsers.add_parser('cancel', help='Cancel a queued or running job, the dump of a cancelled dump job is removed')
+    cancel.add_argument('--id', type=int, required=True, help='Id of the job')
+    jobs_subparsers.add_parser('worker', help=argparse.SUPPRESS)
+    run = jobs_subparsers.add_parser('run', help=argparse.SUPPRESS)
+    run.add_argument('--id', type=int, required=True)
+
+    stats = subparsers.add_parser('stats', help='Show how long past operations and their phases took, as percentiles per configuration')
+    stats.add_argument('--config', help='Only show the operations of this configuration')
+
+    config = subparsers.add_parser('config', help='Configuration commands')
+    config_subparsers = config.add_subparsers(dest='config_command')
+    config_subparsers.required = True
+    show = config_subparsers.add_parser('show', help='Show a configuration')
+    addConfigArgument(show)
+    return parser
+
+def runCommand(arguments):
+    # Imported here so 'jdump --help' does not have to load anything
+    import actions
+
+    if arguments.command == 'dump-all':
+        if not actions.configFileExists():
+            return 1
+        return 0 if actions.createConfigurationDumps(arguments.configs, arguments.dump, arguments.per_host) else 1
+    if arguments.command == 'jobs':
+        return runJobsCommand(actions, arguments)
+    if arguments.command == 'stats':
+        actions.showStatistics(arguments.config)
+        return 0
+    config = actions.getConfig(arguments.config)
+    if not config:
+        return 1
+    if getattr(arguments, 'subset', False) and not actions.hasSubset(config):
+        actions.logError("Configuration '%s' has no subsetTables or subsetSchemaOnly" % config.config_id)
+        return 1
+    if getattr(arguments, 'background', False):
+        return submitJob(actions, config, arguments)
+    if arguments.command == 'dump':
+        return 0 if actions.createNamedDump(config, arguments.dump, subset=arguments.subset, incremental=arguments.incremental) else 1
+    elif arguments.command == 'restore':
+        dump_to_restore = os.path.join(config.dumpFolder, arguments.dump)
+        if not os.path.exists(dump_to_restore):
+            actions.logError("Dump '%s' does not exist" % dump_to_restore)
+            return 1
+        # Restoring some tables keeps the others, the database is only emptied when asked for
+        clean = arguments.tables is None or arguments.clean
+        with actions.operation(config, 'restore'):
+            success = (not clean or actions.recreateDatabase(config)) and actions.restoreDatabase(config, dump_to_restore, arguments.fast, arguments.tables, arguments.jobs)
+        if not success:
+            actions.logError("Restoring '%s' failed" % dump_to_restore)
+            return 1
+    elif arguments.command == 'resume':
+        if not actions.resumeRestore(config):
+            return 1
+    elif arguments.command == 'copy':
+        target = actions.getConfig(arguments.to)
+        if not target or not actions.copyConfiguration(config, target, arguments.dump):
+            return 1
+    elif arguments.command == 'clean':
+        if not actions.recreateDatabase(config):
+            actions.logError("Cleaning '%s' failed" % config.database)
+            return 1
+    elif arguments.command == 'snapshot':
+        if not os.path.exists(os.path.join(config.dumpFolder, arguments.dump)):
+            actions.logError("Dump '%s' does not exist" % arguments.dump)
+            return 1
+        with actions.operation(config, 'snapshot'):
+            success = actions.recreateDatabase(config) and actions.createDumpSnapshot(config, arguments.dump)
+        if not success:
+            return 1
+    elif arguments.command == 'list':
+        actions.listDumps(config, arguments.sort, arguments.dump)
+    elif arguments.command == 'compare':
+        if not actions.compareNamedDumps(config, arguments.dump, arguments.other, arguments.rows):
+            return 1
+    elif arguments.command == 'index':
+        if not actions.listDumpTables(config, os.path.join(config.dumpFolder, arguments.dump)):
+            return 1
+    elif arguments.command == 'gc':
+        actions.removeUnusedChunks(config)
+    elif arguments.command == 'config':
+        actions.showConfig(config)
+    return 0
+
+def submitJob(actions, config, arguments):
+    if arguments.command == 'dump':
+        actions.submitJob('dump', config, dump=arguments.dump, subset=arguments.subset, incremental=arguments.incremental)
+    elif arguments.command == 'restore':
+        if not os.path.exists(os.path.join(config.dumpFolder, arguments.dump)):
+            actions.logError("Dump '%s' does not exist" % arguments.dump)
+            return 1
+        actions.submitJob('restore', config, dump=arguments.dump, fast=arguments.fast, tables=arguments.tables, jobs=arguments.jobs, clean=arguments.clean)
+    else:
+        actions.submitJob('clean', config)
+    return 0
+
+def runJobsCommand(actions, arguments):
+    if arguments.jobs_command == 'list':
+        actions.showJobs()
+    elif arguments.jobs_command == 'cancel':
+        return 0 if actions.cancelJobById(arguments.id) else 1
+    elif arguments.jobs_command == 'worker':
+        actions.jobStore().runWorker()
+    elif arguments.jobs_command == 'run':
+        return 0 if actions.runJob(arguments.id) else 1
+    return 0
@@ -0,0 +1,311 @@
+import os
+import posixpath
+import shlex
+import shutil
+
+COMPRESSION_TYPES = ['none', 'gzip', 'zstd']
+COMPRESSION_EXTENSIONS = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+DUMP_EXTENSIONS = ('.sql', '.sql.gz', '.sql.zst', '.dump')
+DUMP_FORMATS = ['plain', 'custom', 'directory']
+STORAGE_TYPES = ['files', 'dedup']
+DEDUP_EXTENSION = '.sql.jdm'
+CONTAINER_TMP_FOLDER = '/tmp'
+DOCKER_TRANSPORTS = ['exec', 'tcp', 'mount']
+DEFAULT_PORTS = {
+    'mysql': 3306,
+    'postgres': 5432
+}
+MANIFEST_FILE = 'manifest.json'
+# Full dumps of incremental configurations write the binlog position they were taken at in their header
+MYSQL_BASE_DUMP_OPTIONS = ' --single-transaction --master-data=2'
+MYSQL_FAST_RESTORE_PREFIX = 'SET foreign_key_checks=0; SET unique_checks=0; SET autocommit=0;'
+MYSQL_FAST_RESTORE_SUFFIX = 'COMMIT;'
+PG_FAST_RESTORE_OPTIONS = '-c synchronous_commit=off'
+
+def clientEnv(config):
+    env = os.environ.copy()
+    if config.databaseType == 'postgres' and not dockerExec(config):
+        env['PGPASSWORD'] = str(config.databasePassword)
+    return env
+
+def dockerTransport(config):
+    if not config.isDocker:
+        return None
+    return config.dockerTransport or 'exec'
+
+def dockerExec(config):
+    # With the tcp transport the clients run on the host and connect to the published port of the container
+    return config.isDocker and dockerTransport(config) != 'tcp'
+
+def hostOptions(config):
+    if dockerTransport(config) != 'tcp':
+        return ''
+    port = int(config.dockerPort or DEFAULT_PORTS[config.databaseType])
+    if config.databaseType == 'mysql':
+        return ' -h 127.0.0.1 -P %d' % port
+    return ' -h 127.0.0.1 -p %d' % port
+
+def mountedPath(config, path):
+    # Where the container sees a file of the dump folder through the bind mount, None when it can not see it
+    if dockerTransport(config) != 'mount' or not config.dockerDumpFolder:
+        return None
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(config.dumpFolder))
+    if relative.startswith('..'):
+        return None
+    return posixpath.join(config.dockerDumpFolder, relative.replace(os.sep, '/'))
+
+def dumpCommand(config):
+    if config.databaseType == 'mysql':
+        if dockerExec(config):
+            return "docker exec %s sh -c 'exec mysqldump -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s'" % (config.dockerContainerName, config.database)
+        return "mysqldump%s -u %s -p%s %s" % (hostOptions(config), config.databaseUser, config.databasePassword, config.database)
+    elif config.databaseType == 'postgres':
+        return pgDumpCommand(config)
+
+def restoreCommand(config, fast=False):
+    # docker exec -i mysql_slims_66 sh -c 'exec mysql -uroot -p\"$MYSQL_ROOT_PASSWORD\" slimsdb66 ' < /Users/dekeyzer/Documents/DbDumps/SLIMS/6.6/slims65_start.sql
+    if config.databaseType == 'mysql':
+        if dockerExec(config):
+            return "docker exec -i %s sh -c 'exec mysql -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s '" % (config.dockerContainerName, config.database)
+        return "mysql%s -u %s -p%s %s" % (hostOptions(config), config.databaseUser, config.databasePassword, config.database)
+    elif config.databaseType == 'postgres':
+        options = psqlOptions(fast)
+        if dockerExec(config):
+            return "docker exec -i %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\"%s && psql -U %s -d %s%s'" % (config.dockerContainerName, pgFastRestoreExport(fast), config.databaseUser, config.database, options)
+        return "%spsql%s -U %s -d %s%s" % (pgFastRestoreEnv(fast), hostOptions(config), config.databaseUser, config.database, options)
+
+def psqlOptions(fast):
+    return ' --single-transaction -v ON_ERROR_STOP=1' if fast else ''
+
+def pgFastRestoreExport(fast):
+    return ' && export PGOPTIONS=\"%s\"' % PG_FAST_RESTORE_OPTIONS if fast else ''
+
+def pgFastRestoreEnv(fast):
+    return "PGOPTIONS='%s' " % PG_FAST_RESTORE_OPTIONS if fast else ''
+
+def fastRestoreInputCommand(config, input_command):
+    # Wraps the SQL stream in session settings that skip the per row checks and commit once at the end
+    if config.databaseType != 'mysql':
+        return input_command
+    return "{ printf '%%s\\n' '%s'; %s; printf '%%s\\n' '%s'; }" % (MYSQL_FAST_RESTORE_PREFIX, input_command or 'cat', MYSQL_FAST_RESTORE_SUFFIX)
+
+def mysqlDumpTablesCommand(config, tables, options='', database=None):
+    tables = ' '.join('"%s"' % table for table in tables)
+    database = database or config.database
+    if dockerExec(config):
+        return "docker exec %s sh -c 'exec mysqldump -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s%s %s'" % (config.dockerContainerName, database, options, tables)
+    return "mysqldump%s -u %s -p%s %s%s %s" % (hostOptions(config), config.databaseUser, config.databasePassword, database, options, tables)
+
+def mysqlQueryCommand(config, query):
+    if dockerExec(config):
+        return "docker exec %s sh -c 'exec mysql -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" -N -B -e \"%s\" %s'" % (config.dockerContainerName, query, config.database)
+    return 'mysql%s -u %s -p%s -N -B -e "%s" %s' % (hostOptions(config), config.databaseUser, config.databasePassword, query, config.database)
+
+def pgAdminCommand(config, command):
+    if dockerExec(config):
+        return "docker exec %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\" && %s'" % (config.dockerContainerName, command)
+    return command
+
+def mysqlAdminCommand(config, arguments):
+    if dockerExec(config):
+        return "docker exec %s sh -c 'exec mysqladmin -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s'" % (config.dockerContainerName, arguments)
+    return "mysqladmin%s -u %s -p%s %s" % (hostOptions(config), config.databaseUser, config.databasePassword, arguments)
+
+def dropDatabaseCommand(config, database):
+    if config.databaseType == 'mysql':
+        return mysqlAdminCommand(config, '-f drop %s' % database)
+    return pgAdminCommand(config, 'dropdb%s -U %s --if-exists %s' % (hostOptions(config), config.databaseUser, database))
+
+def createDatabaseCommand(config, database, template=None):
+    if config.databaseType == 'mysql':
+        return mysqlAdminCommand(config, 'create %s' % database)
+    if template:
+        return pgAdminCommand(config, 'createdb%s -U %s -T %s %s' % (hostOptions(config), config.databaseUser, template, database))
+    return pgAdminCommand(config, 'createdb%s -U %s %s' % (hostOptions(config), config.databaseUser, database))
+
+def recreateDatabaseCommands(config):
+    return [
+        dropDatabaseCommand(config, config.database),
+        createDatabaseCommand(config, config.database)
+    ]
+
+def dumpExtension(config):
+    if config.dumpFormat == 'custom':
+        return '.dump'
+    elif config.dumpFormat == 'directory':
+        return ''
+    elif config.storage == 'dedup':
+        return DEDUP_EXTENSION
+    return '.sql' + COMPRESSION_EXTENSIONS.get(config.compression, '')
+
+def dumpFormatOf(dump_path):
+    if os.path.isdir(dump_path):
+        if os.path.exists(os.path.join(dump_path, 'toc.dat')) or os.path.exists(os.path.join(dump_path, MANIFEST_FILE)):
+            return 'directory'
+        return None
+    if dump_path.endswith('.dump'):
+        return 'custom'
+    if dump_path.endswith(DEDUP_EXTENSION):
+        return 'dedup'
+    if dump_path.endswith(DUMP_EXTENSIONS):
+        return 'plain'
+    return None
+
+def containerPath(dump_path):
+    return CONTAINER_TMP_FOLDER + '/jdump_' + os.path.basename(os.path.normpath(dump_path))
+
+def dumpJobs(config):
+    return int(config.dumpJobs or 1)
+
+def pgDumpCommand(config, output=None, dump_options='', dump_format=None):
+    dump_format = dump_format or config.dumpFormat
+    options = ''
+    if dump_format == 'custom':
+        options = ' -Fc'
+        if config.compressionLevel:
+            options += ' -Z %d' % int(config.compressionLevel)
+    elif dump_format == 'directory':
+        options = ' -Fd -j %d' % dumpJobs(config)
+    options += dump_options
+    if output:
+        options += ' -f "%s"' % output
+    if dockerExec(config):
+        return "docker exec %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\" && pg_dump -U %s -d %s%s'" % (config.dockerContainerName, config.databaseUser, config.database, options)
+    return "pg_dump%s -U %s -d %s%s" % (hostOptions(config), config.databaseUser, config.database, options)
+
+def shellArgument(config, value):
+    # Arguments of commands run through docker exec end up inside the single quotes of its sh -c
+    value = shlex.quote(value)
+    if dockerExec(config):
+        value = value.replace("'", "'\\''")
+    return value
+
+def qualifiedTable(table):
+    return table if '.' in table else 'public.' + table
+
+def pgCopyCommand(config, table, rows):
+    # The rows are framed like the data sections of pg_dump, so the dump restores, indexes and compares like any other
+    table = qualifiedTable(table)
+    schema, name = table.split('.', 1)
+    condition = ' LIMIT %d' % rows if isinstance(rows, int) else ' WHERE %s' % rows
+    query = 'COPY (SELECT * FROM %s%s) TO STDOUT' % (table, condition)
+    header = '--\n-- Data for Name: %s; Type: TABLE DATA; Schema: %s; Owner: -\n--\n\nCOPY %s FROM stdin;' % (name, schema, table)
+    return "printf '%%s\\n' %s && %s && printf '%%s\\n\\n' '\\.'" % (shlex.quote(header), pgQueryCommand(config, query))
+
+def pgQueryCommand(config, query):
+    return pgAdminCommand(config, 'psql%s -U %s -d %s -X -q -At -v ON_ERROR_STOP=1 -c %s' % (hostOptions(config), config.databaseUser, config.database, shellArgument(config, query)))
+
+def copyDumpCommand(config):
+    # A copy streams into the client of another database, a plain dump whatever format the configuration dumps in.
+    # The owner and privileges are left out, the other configuration may connect as another user.
+    if config.databaseType == 'mysql':
+        return dumpCommand(config)
+    return pgDumpCommand(config, dump_options=' -O -x', dump_format='plain')
+
+def baseDumpCommand(config):
+    if config.databaseType == 'mysql':
+        return mysqlDumpTablesCommand(config, [], MYSQL_BASE_DUMP_OPTIONS)
+    return dumpCommand(config)
+
+def mysqlBinlogCommand(config, files, start, stop):
+    # The start position applies to the first binlog, the stop position to the last one
+    options = '--read-from-remote-server --database=%s --start-position=%d --stop-position=%d %s' % (config.database, start, stop, ' '.join(files))
+    if dockerExec(config):
+        return "docker exec %s sh -c 'exec mysqlbinlog -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s'" % (config.dockerContainerName, options)
+    return 'mysqlbinlog%s -u %s -p%s %s' % (hostOptions(config), config.databaseUser, config.databasePassword, options)
+
+def subsetDumpCommand(config):
+    # The schema of every table, then the rows of the tables the subset leaves alone, then the rows the subset keeps.
+    # MySQL triggers come last so they do not fire for the restored rows.
+    subset_tables = config.subsetTables or {}
+    without_data = list(subset_tables) + list(config.subsetSchemaOnly or [])
+    if config.databaseType == 'mysql':
+        data_options = ' --no-create-info --skip-triggers'
+        commands = [
+            mysqlDumpTablesCommand(config, [], ' --no-data --skip-triggers'),
+            mysqlDumpTablesCommand(config, [], data_options + ''.join(' --ignore-table=%s.%s' % (config.database, table) for table in without_data))
+        ]
+        for table, rows in subset_tables.items():
+            condition = '1 LIMIT %d' % rows if isinstance(rows, int) else rows
+            commands.append(mysqlDumpTablesCommand(config, [table], data_options + ' --where=%s' % shellArgument(config, condition)))
+        commands.append(mysqlDumpTablesCommand(config, [], ' --no-data --no-create-info --skip-routines --skip-events'))
+    else:
+        # Constraints and indexes come last like in a full dump, they would slow down or reject the rows otherwise
+        commands = [
+            pgDumpCommand(config, dump_options=' --section=pre-data'),
+            pgDumpCommand(config, dump_options=' --section=data' + ''.join(' --exclude-table-data=%s' % qualifiedTable(table) for table in without_data))
+        ]
+        commands += [pgCopyCommand(config, table, rows) for table, rows in subset_tables.items()]
+        commands.append(pgDumpCommand(config, dump_options=' --section=post-data'))
+    return '{ %s; }' % ' && '.join(commands)
+
+def pgRestoreCommand(config, dump_path, fast=False, tables=None, jobs=None):
+    options = '-j %d' % (jobs or dumpJobs(config))
+    if tables:
+        options += ''.join(' -t %s' % table for table in tables)
+    if dockerExec(config):
+        return "docker exec %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\"%s && pg_restore -U %s -d %s %s %s'" % (config.dockerContainerName, pgFastRestoreExport(fast), config.databaseUser, config.database, options, dump_path)
+    return '%spg_restore%s -U %s -d %s %s "%s"' % (pgFastRestoreEnv(fast), hostOptions(config), config.databaseUser, config.database, options, dump_path)
+
+def mountedDumpCommand(config, container_path):
+    # The container writes the dump into the bind mounted dump folder, nothing is streamed through docker
+    if config.databaseType == 'mysql':
+        return "docker exec %s sh -c 'exec mysqldump -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" --result-file=\"%s\" %s'" % (config.dockerContainerName, container_path, config.database)
+    return pgDumpCommand(config, container_path)
+
+def mountedRestoreCommand(config, container_path, fast=False):
+    if config.databaseType == 'mysql':
+        return "docker exec %s sh -c 'exec mysql -uroot -p\\\"$MYSQL_ROOT_PASSWORD\\\" %s < \"%s\"'" % (config.dockerContainerName, config.database, container_path)
+    return "docker exec %s sh -c 'export PGPASSWORD=\"$POSTGRES_PASSWORD\"%s && psql -U %s -d %s%s -f \"%s\"'" % (config.dockerContainerName, pgFastRestoreExport(fast), config.databaseUser, config.database, psqlOptions(fast), container_path)
+
+def dockerCopyToCommand(config, path, container_path):
+    return 'docker cp "%s" %s:%s' % (path, config.dockerContainerName, container_path)
+
+def dockerCopyFromCommand(config, container_path, path):
+    return 'docker cp %s:%s "%s"' % (config.dockerContainerName, container_path, path)
+
+def dockerRemoveCommand(config, container_path):
+    return 'docker exec %s rm -rf %s' % (config.dockerContainerName, container_path)
+
+def compressionOf(dump_file):
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if extension and dump_file.endswith('.sql' + extension):
+            return compression
+    return 'none'
+
+def compressCommand(config, compression=None):
+    compression = compression or config.compression
+    if compression == 'gzip':
+        # pigz is a drop-in, multi-threaded gzip
+        if shutil.which('pigz'):
+            command = 'pigz -c'
+            if config.compressionThreads:
+                command += ' -p %d' % int(config.compressionThreads)
+        else:
+            command = 'gzip -c'
+        if config.compressionLevel:
+            command += ' -%d' % int(config.compressionLevel)
+        return command
+    elif compression == 'zstd':
+        command = 'zstd -q -c'
+        if config.compressionLevel:
+            if int(config.compressionLevel) > 19:
+                command += ' --ultra'
+            command += ' -%d' % int(config.compressionLevel)
+        if config.compressionThreads is not None:
+            command += ' -T%d' % int(config.compressionThreads)
+        return command
+    return None
+
+def decompressCommand(dump_file):
+    # Reads the compressed dump from stdin, jdump streams the file in itself so it can follow the progress
+    compression = compressionOf(dump_file)
+    if compression == 'gzip':
+        return '%s -dc' % ('pigz' if shutil.which('pigz') else 'gzip')
+    elif compression == 'zstd':
+        return 'zstd -q -dc'
+    return None
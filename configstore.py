@@ -0,0 +1,96 @@
+import copy
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConfigStore:
+
+    def __init__(self, path, config_factory):
+        self.path = path
+        self.config_factory = config_factory
+        self.signature = None
+        self.digest = None
+        self.configs_cache = None
+        self.config_objects = {}
+
+    def currentSignature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def configs(self):
+        signature = self.currentSignature()
+        if signature != self.signature:
+            with open(self.path, 'rb') as stream:
+                content = stream.read()
+            digest = hashlib.sha1(content).hexdigest()
+            # A touched but unchanged file keeps the parsed configurations
+            if digest != self.digest:
+                self.configs_cache = self.parse(content)
+                self.config_objects = {}
+                self.digest = digest
+            self.signature = signature
+        return self.configs_cache
+
+    def parse(self, content):
+        import yaml
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        return yaml.load(content, Loader=loader) or {}
+
+    def configObject(self, key):
+        configs = self.configs()
+        if key not in self.config_objects:
+            self.config_objects[key] = self.config_factory(key, configs[key])
+        return self.config_objects[key]
+
+    def save(self, configs):
+        import yaml
+        content = yaml.dump(configs).encode('utf-8')
+        # Write a temporary file next to the configuration and rename it, readers see either the old or the new file
+        fd, tmp_path = tempfile.mkstemp(prefix='.config.yml.', dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.configs_cache = copy.deepcopy(configs)
+        self.config_objects = {}
+        self.digest = hashlib.sha1(content).hexdigest()
+        self.signature = self.currentSignature()
+
+    @contextmanager
+    def lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self, function):
+        # Other jdump processes may have changed the file while we were asking questions, apply the change to the latest version
+        with self.lock():
+            configs = copy.deepcopy(self.configs()) if os.path.exists(self.path) else {}
+            function(configs)
+            self.save(configs)
+
+    def set(self, key, value):
+        def setValue(configs):
+            configs[key] = value
+        self.update(setValue)
+
+    def remove(self, key):
+        self.update(lambda configs: configs.pop(key, None))
@@ -1,15 +1,22 @@
-from PyInquirer import Token, style_from_dict
-
 configToUseVarName='configToUse'
-style = style_from_dict({
-    Token.Separator: '#cc5454',
-    Token.QuestionMark: '#673ab7 bold',
-    Token.Selected: '#cc5454',  # default
-    Token.Pointer: '#673ab7 bold',
-    Token.Instruction: '',  # default
-    Token.Answer: '#f44336 bold',
-    Token.Question: '',
-})
+dumpSortNames=['Newest first', 'Oldest first', 'Largest first', 'Name']
+defaultDumpSort='Oldest first'
+dumpsPageSize=20
+# Dumps running at once against the same database server when dumping several configurations
+dumpsPerHost=1
+# Time in seconds 'python jdump.py <command>' may take before it starts working
+startupTimeTarget=0.1
+
+# Colors of the prompts by PyInquirer token name, actions.prompt turns them into a style when a question is asked
+style = {
+    'Separator': '#cc5454',
+    'QuestionMark': '#673ab7 bold',
+    'Selected': '#cc5454',  # default
+    'Pointer': '#673ab7 bold',
+    'Instruction': '',  # default
+    'Answer': '#f44336 bold',
+    'Question': '',
+}
 
 class BColors:
     RED='\033[0;31m'
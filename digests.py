@@ -0,0 +1,214 @@
+import hashlib
+import os
+import re
+
+from catalog import refreshCatalog, updateDump
+from chunks import ChunkReader
+from commands import decompressCommand, dumpFormatOf
+from pipeline import pump, runPipeline
+from tableindex import (MYSQL_FOOTER, MYSQL_OBJECTS_SECTION, MYSQL_SECTION,
+                        MYSQL_SECTION_TYPES, PG_DATA_TYPES, PG_FOOTER,
+                        PG_INDEX_TABLE, PG_OWNED_BY_TABLE, PG_SECTION, pgOwner,
+                        unqualified)
+
+DIGESTS_VERSION = 2
+# Sequences, functions, routines and other objects that belong to no table are compared as one
+OTHER_OBJECTS = '(other objects)'
+DATA_DIGEST_MODULUS = 2 ** 128
+AUTO_INCREMENT = re.compile(rb' AUTO_INCREMENT=\d+')
+ROW_TOKENS = re.compile(rb"'(?:[^'\\]|\\.)*'|[()]")
+
+
+def insertRows(line):
+    # Values of an extended insert are split by their parentheses, parentheses inside quoted strings do not count
+    values = line.find(b' VALUES ')
+    if values < 0:
+        return b'', []
+    rows = []
+    depth = 0
+    start = None
+    for token in ROW_TOKENS.finditer(line, values):
+        if token.group() == b'(':
+            if depth == 0:
+                start = token.start()
+            depth += 1
+        elif token.group() == b')':
+            depth -= 1
+            if depth == 0:
+                rows.append(line[start:token.end()])
+    return line[:values], rows
+
+
+class TableDigest:
+
+    def __init__(self):
+        self.schema = hashlib.sha256()
+        self.data = 0
+        self.rows = 0
+        self.size = 0
+
+    def addSchema(self, line):
+        self.schema.update(line)
+        self.size += len(line)
+
+    def addData(self, line, rows=None):
+        # Rows are summed instead of hashed in order, pg_dump writes them in physical order which an update changes.
+        # An extended insert of MySQL is summed row by row, where a row ends up depends on the rows before it.
+        for row in rows or [line]:
+            self.data = (self.data + int.from_bytes(hashlib.blake2b(row, digest_size=16).digest(), 'big')) % DATA_DIGEST_MODULUS
+        self.size += len(line)
+
+    def result(self, rows):
+        return {
+            'schema': self.schema.hexdigest(),
+            'data': '%032x' % self.data,
+            'rows': self.rows if rows else None,
+            'size': self.size
+        }
+
+
+class DigestWriter:
+
+    def __init__(self, rows=False):
+        self.rows = rows
+        self.tables = {}
+        self.pending = b''
+        self.database_type = None
+        self.table = None
+        self.is_data = False
+        self.find_owner = None
+        self.in_copy = False
+        self.in_footer = False
+
+    def write(self, data):
+        lines = (self.pending + data).split(b'\n')
+        self.pending = lines.pop()
+        for line in lines:
+            self.digestLine(line)
+
+    def close(self):
+        if self.pending:
+            self.digestLine(self.pending)
+        return {name: table.result(self.rows) for name, table in self.tables.items()}
+
+    def tableDigest(self, name):
+        if name not in self.tables:
+            self.tables[name] = TableDigest()
+        return self.tables[name]
+
+    def startSection(self, name, is_data):
+        self.table = self.tableDigest(name or OTHER_OBJECTS)
+        self.is_data = is_data
+        # Subset dumps are several dumps in a row, a section after a footer starts the next one
+        self.in_footer = False
+
+    def digestLine(self, line):
+        if self.in_copy:
+            if line == b'\\.':
+                self.in_copy = False
+                return
+            self.table.addData(line)
+            if self.rows:
+                self.table.rows += 1
+            return
+        if self.database_type is None:
+            if line.startswith((b'-- MySQL dump', b'-- MariaDB dump')):
+                self.database_type = 'mysql'
+            elif line.startswith(b'-- PostgreSQL database dump'):
+                self.database_type = 'postgres'
+        if self.database_type == 'mysql' and MYSQL_FOOTER.match(line):
+            self.in_footer = True
+            return
+        if line.startswith(b'--'):
+            # Section comments and the dump date are not part of the content
+            if self.database_type == 'mysql':
+                self.mysqlSection(line)
+            elif self.database_type == 'postgres':
+                self.pgSection(line)
+            return
+        if not line or self.table is None or self.in_footer:
+            return
+        if self.find_owner is not None:
+            # The table of an index or sequence is only named in its statement
+            match = self.find_owner.match(line + b'\n')
+            if match:
+                target = match.group(match.lastindex)
+                if self.find_owner is PG_OWNED_BY_TABLE:
+                    target = target.rsplit(b'.', 1)[0]
+                self.startSection(unqualified(target).decode('utf-8'), False)
+                self.find_owner = None
+        if self.is_data:
+            if line.startswith(b'INSERT INTO '):
+                head, rows = insertRows(line)
+                self.table.addData(line, [head + row for row in rows])
+                if self.rows:
+                    self.table.rows += len(rows)
+            else:
+                self.table.addData(line)
+            if line.startswith(b'COPY ') and line.endswith(b'FROM stdin;'):
+                self.in_copy = True
+        else:
+            # The next auto increment value changes with every insert, it is not part of the schema of the table
+            self.table.addSchema(AUTO_INCREMENT.sub(b'', line))
+
+    def mysqlSection(self, line):
+        match = MYSQL_SECTION.match(line + b'\n')
+        if match:
+            self.startSection(match.group(2).decode('utf-8'), MYSQL_SECTION_TYPES[match.group(1)] == 'TABLE DATA')
+        elif MYSQL_OBJECTS_SECTION.match(line):
+            self.startSection(None, False)
+
+    def pgSection(self, line):
+        match = PG_SECTION.match(line)
+        if match:
+            section_type = match.group(3).decode('utf-8')
+            self.startSection(pgOwner(section_type, match.group(2).decode('utf-8')), section_type in PG_DATA_TYPES)
+            self.find_owner = {'INDEX': PG_INDEX_TABLE, 'SEQUENCE OWNED BY': PG_OWNED_BY_TABLE}.get(section_type)
+        elif PG_FOOTER.match(line):
+            self.in_footer = True
+
+
+def isComparable(dump_file):
+    return dumpFormatOf(dump_file) in ['plain', 'dedup']
+
+def digestDump(dump_file, rows=False, progress=None):
+    writer = DigestWriter(rows)
+    if dumpFormatOf(dump_file) == 'dedup':
+        reader = ChunkReader(dump_file)
+    else:
+        reader = open(dump_file, 'rb')
+    try:
+        decompress_command = decompressCommand(dump_file)
+        if decompress_command:
+            if not runPipeline([decompress_command], stdin=reader, stdout=writer, progress=progress):
+                return None
+        else:
+            pump(reader, writer, [lambda chunk: progress.update(len(chunk))] if progress is not None else [])
+    finally:
+        reader.close()
+    return writer.close()
+
+def dumpDigests(dump_folder, name, rows=False, progress=None):
+    # Digests are kept in the catalog entry of the dump, the catalog drops them when the dump changes
+    cached = refreshCatalog(dump_folder).get(name, {}).get('digests')
+    if cached and cached['version'] == DIGESTS_VERSION and (cached['rows'] or not rows):
+        return cached['tables']
+    tables = digestDump(os.path.join(dump_folder, name), rows, progress)
+    if tables is not None:
+        updateDump(dump_folder, name, digests={'version': DIGESTS_VERSION, 'rows': rows, 'tables': tables})
+    return tables
+
+def compareDigests(tables, other_tables):
+    differences = []
+    for name in sorted(set(tables) | set(other_tables)):
+        table = tables.get(name)
+        other = other_tables.get(name)
+        if table is None or other is None:
+            differences.append((name, 'only in one dump', table, other))
+        elif table['schema'] != other['schema']:
+            differences.append((name, 'schema differs', table, other))
+        elif table['data'] != other['data']:
+            differences.append((name, 'data differs', table, other))
+        elif table['rows'] is not None and other['rows'] is not None and table['rows'] != other['rows']:
+            differences.append((name, 'row count differs', table, other))
+    return differences
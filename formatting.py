@@ -0,0 +1,30 @@
+import datetime
+
+
+def formatSize(size):
+    if size is None:
+        return '-'
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if abs(size) < 1024 or unit == 'TB':
+            return ('%d %s' if unit == 'B' else '%.1f %s') % (size, unit)
+        size /= 1024.0
+
+def formatDuration(seconds):
+    if seconds is None:
+        return '-'
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '%dh%02dm%02ds' % (hours, minutes, seconds)
+    if minutes:
+        return '%dm%02ds' % (minutes, seconds)
+    return '%ds' % seconds
+
+def formatSeconds(seconds):
+    # Short operations, like dropping a database, still show how long they took
+    if seconds is not None and seconds < 60:
+        return '%.1fs' % seconds
+    return formatDuration(seconds)
+
+def formatDate(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%m/%d/%Y, %H:%M:%S")
@@ -0,0 +1,205 @@
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+HISTORY_FILE = '.jdump_history.jsonl'
+HISTORY_VERSION = 1
+PERCENTILES = [50, 90, 99]
+# The first pattern that matches one of the commands of a pipeline names its phase
+PHASES = [
+    ('dump', re.compile(r'\b(mysqldump|mysqlbinlog|pg_dump)\b|\bpsql\b.* TO STDOUT')),
+    ('drop', re.compile(r'\bdropdb\b|\bmysqladmin\b.* drop ')),
+    ('create', re.compile(r'\bcreatedb\b|\bmysqladmin\b.* create ')),
+    ('query', re.compile(r'\bmysql\b.* -e |\bpsql\b.* -c ')),
+    ('load', re.compile(r'\b(mysql|psql|pg_restore)\b')),
+    ('copy', re.compile(r'\bdocker cp\b'))
+]
+PROGRAMS = re.compile(r'\b(mysqldump|mysqlbinlog|mysqladmin|mysql|pg_dump|pg_restore|psql|dropdb|createdb|pigz|gzip|zstd)\b')
+CURRENT = threading.local()
+
+
+class Operation:
+
+    def __init__(self, config, name, details):
+        self.record = {
+            'version': HISTORY_VERSION,
+            'operation': name,
+            'config': config.config_id,
+            'databaseType': config.databaseType,
+            'started': time.time(),
+            'seconds': None,
+            'success': None,
+            'phases': []
+        }
+        self.record.update(details)
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def addPhase(self, phase, started, success, bytes_count=None, commands=None, exit_codes=None):
+        with self.lock:
+            self.record['phases'].append({
+                'phase': phase,
+                'started': started,
+                'seconds': time.time() - started,
+                'success': success,
+                'bytes': bytes_count,
+                'commands': commands,
+                'exitCodes': exit_codes
+            })
+
+
+def historyFile():
+    # Next to config.yml, the history covers every configuration
+    return os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), HISTORY_FILE)
+
+def currentOperation():
+    return getattr(CURRENT, 'operation', None)
+
+def withinOperation(operation, function, *arguments):
+    # Worker threads of a parallel restore report to the operation of the thread that started them
+    previous = currentOperation()
+    CURRENT.operation = operation
+    try:
+        return function(*arguments)
+    finally:
+        CURRENT.operation = previous
+
+@contextmanager
+def recordOperation(history_file, config, name, **details):
+    if currentOperation() is not None:
+        # A restore cleans the database first, the clean is a phase of the restore and not an operation of its own
+        operation = currentOperation()
+        try:
+            yield operation
+        except BaseException:
+            operation.failed = True
+            raise
+        return
+    operation = Operation(config, name, details)
+    CURRENT.operation = operation
+    try:
+        yield operation
+    except BaseException:
+        # Every command may have worked, the operation still did not finish
+        operation.failed = True
+        raise
+    finally:
+        CURRENT.operation = None
+        phases = operation.record['phases']
+        if phases:
+            # Prompts are not part of the operation, it runs from its first to its last command
+            ended = max(phase['started'] + phase['seconds'] for phase in phases)
+            operation.record['started'] = min(phase['started'] for phase in phases)
+            operation.record['seconds'] = ended - operation.record['started']
+            # Dropping a database that does not exist fails, jdump carries on with the create
+            operation.record['success'] = not operation.failed and all(phase['success'] for phase in phases if phase['phase'] != 'drop')
+            appendHistory(history_file, operation.record)
+
+def recorded(name):
+    # Every command the function runs becomes a phase of one operation of the configuration it is called with
+    def decorate(function):
+        @functools.wraps(function)
+        def run(config, *arguments, **keywords):
+            with recordOperation(historyFile(), config, name) as operation:
+                result = function(config, *arguments, **keywords)
+                # The functions return False or None when they fail, also when every command they ran worked
+                if result is None or result is False:
+                    operation.failed = True
+                return result
+        return run
+    return decorate
+
+def describeOperation(**details):
+    operation = currentOperation()
+    if operation is not None:
+        for key, value in details.items():
+            operation.record.setdefault(key, value)
+
+def commandPhase(commands):
+    for phase, pattern in PHASES:
+        if any(pattern.search(command) for command in commands):
+            return phase
+    return commands[0].split(' ')[0]
+
+def commandPrograms(commands):
+    programs = []
+    for command in commands:
+        match = PROGRAMS.search(command)
+        programs.append(match.group(1) if match else command.split(' ')[0])
+    return programs
+
+def recordCommands(commands, started, exit_codes, bytes_count=None):
+    operation = currentOperation()
+    if operation is not None:
+        operation.addPhase(commandPhase(commands), started, all(code == 0 for code in exit_codes), bytes_count, commandPrograms(commands), exit_codes)
+
+def recordPhase(phase, started, success, bytes_count=None):
+    operation = currentOperation()
+    if operation is not None:
+        operation.addPhase(phase, started, success, bytes_count)
+
+def appendHistory(history_file, record):
+    # One line per operation, appended in a single write so concurrent dumps do not interleave their lines
+    try:
+        with open(history_file, 'a') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+    except OSError:
+        pass
+
+def readHistory(history_file):
+    records = []
+    if not os.path.exists(history_file):
+        return records
+    with open(history_file, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash is skipped
+                continue
+            if record.get('version') == HISTORY_VERSION:
+                records.append(record)
+    return records
+
+def percentile(values, percent):
+    # Nearest rank, the value of an actual run rather than an interpolation between two runs
+    values = sorted(values)
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+def timings(values):
+    return {'p%d' % percent: percentile(values, percent) for percent in PERCENTILES}
+
+def phaseSpans(record):
+    # The tables of a parallel restore load at the same time, a phase lasts from its first start to its last end
+    spans = {}
+    for phase in record['phases']:
+        start, end = spans.get(phase['phase'], (phase['started'], phase['started'] + phase['seconds']))
+        spans[phase['phase']] = (min(start, phase['started']), max(end, phase['started'] + phase['seconds']))
+    return {phase: end - start for phase, (start, end) in spans.items()}
+
+def operationStatistics(records):
+    groups = {}
+    for record in records:
+        groups.setdefault((record['config'], record['operation']), []).append(record)
+    statistics = []
+    for (config_id, operation), group in sorted(groups.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+        successful = [record for record in group if record['success']]
+        phases = {}
+        for record in successful:
+            for phase, seconds in phaseSpans(record).items():
+                phases.setdefault(phase, []).append(seconds)
+        statistics.append({
+            'config': config_id,
+            'operation': operation,
+            'runs': len(group),
+            'failures': len(group) - len(successful),
+            'seconds': timings([record['seconds'] for record in successful]) if successful else None,
+            'last': max(record['started'] for record in group),
+            'phases': {phase: timings(seconds) for phase, seconds in phases.items()}
+        })
+    return statistics
@@ -0,0 +1,251 @@
+import json
+import os
+import re
+
+from chunks import ChunkReader
+from commands import (clientEnv, decompressCommand, dumpFormatOf,
+                      mysqlBinlogCommand, mysqlQueryCommand, pgQueryCommand)
+from pipeline import dumpToChunks, dumpToFile, readCommand, runPipeline
+
+# mysqldump --master-data=2 writes the position as a comment in the first lines of the dump
+BINLOG_POSITION = re.compile(r"(?:MASTER|SOURCE)_LOG_FILE='([^']+)', (?:MASTER|SOURCE)_LOG_POS=(\d+)")
+DUMP_HEAD_LINES = 100
+DUMP_HEAD_BYTES = 64 * 1024
+SLOT_PREFIX = 'jdump_'
+PG_PRIMARY_KEYS_QUERY = "SELECT json_build_object('table', quote_ident(n.nspname) || '.' || quote_ident(t.relname), 'columns', json_agg(quote_ident(a.attname) ORDER BY a.attnum)) " \
+                        "FROM pg_constraint c JOIN pg_class t ON t.oid = c.conrelid JOIN pg_namespace n ON n.oid = t.relnamespace " \
+                        "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey) WHERE c.contype = 'p' GROUP BY n.nspname, t.relname"
+PG_SEQUENCES_QUERY = "SELECT quote_literal(quote_ident(schemaname) || '.' || quote_ident(sequencename)) || ', ' || last_value FROM pg_sequences WHERE last_value IS NOT NULL"
+TEST_DECODING_CHANGE = re.compile(r'^table (.+?): (INSERT|UPDATE|DELETE|TRUNCATE): (.*)$')
+TEST_DECODING_COLUMN = re.compile(r'''("(?:[^"]|"")*"|[^\[ ]+)\[((?:[^\]]|\](?!:))*)\]:('(?:[^']|'')*'|\S+)''')
+PLAIN_VALUE = re.compile(r'-?[0-9][0-9.eE+-]*|true|false')
+COPY_ESCAPE = re.compile(r'\\(.)')
+COPY_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v'}
+UNCHANGED_TOAST = 'unchanged-toast-datum'
+
+
+def slotName(config):
+    return SLOT_PREFIX + re.sub('[^a-z0-9_]', '_', str(config.config_id).lower())
+
+def dumpChain(entries, name):
+    # From the full dump the chain starts at up to the given dump, None when a dump in between is gone
+    chain = [name]
+    while True:
+        parent = entries[chain[0]].get('chain', {}).get('parent')
+        if parent is None:
+            return chain
+        if parent not in entries:
+            return None
+        chain.insert(0, parent)
+
+def chainHead(entries, config):
+    # Increments always continue the newest dump of the configuration that belongs to a chain
+    dumps = [entry for entry in entries.values() if entry.get('chain') and entry.get('config') == config.config_id]
+    if not dumps:
+        return None
+    return max(dumps, key=lambda entry: entry['created'])
+
+def dumpHead(dump_file):
+    if dumpFormatOf(dump_file) == 'dedup':
+        reader = ChunkReader(dump_file, end=DUMP_HEAD_BYTES)
+        try:
+            return reader.read().decode('utf-8', 'replace').splitlines()[:DUMP_HEAD_LINES]
+        finally:
+            reader.close()
+    decompress_command = decompressCommand(dump_file)
+    if decompress_command:
+        output = readCommand('%s < "%s" | head -n %d' % (decompress_command, dump_file, DUMP_HEAD_LINES))
+        return (output or '').splitlines()
+    lines = []
+    with open(dump_file, 'rb') as f:
+        for line in f:
+            lines.append(line.decode('utf-8', 'replace'))
+            if len(lines) == DUMP_HEAD_LINES:
+                break
+    return lines
+
+def binlogPosition(dump_file):
+    for line in dumpHead(dump_file):
+        match = BINLOG_POSITION.search(line)
+        if match:
+            return {'file': match.group(1), 'position': int(match.group(2))}
+    return None
+
+def dropSlot(config):
+    readCommand(pgQueryCommand(config, "SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots WHERE slot_name = '%s'" % slotName(config)), env=clientEnv(config))
+
+def createSlot(config):
+    # A new full dump starts a new chain, the changes the old slot kept for the old chain are no longer needed
+    slot = slotName(config)
+    dropSlot(config)
+    output = readCommand(pgQueryCommand(config, "SELECT lsn FROM pg_create_logical_replication_slot('%s', 'test_decoding')" % slot), env=clientEnv(config))
+    if not output:
+        return None
+    return {'slot': slot, 'lsn': output.strip()}
+
+def parseLsn(lsn):
+    high, low = lsn.split('/')
+    return (int(high, 16) << 32) + int(low, 16)
+
+def slotError(config, start):
+    # The slot hands out the changes after its confirmed position, which has to be where the chain ends
+    output = readCommand(pgQueryCommand(config, "SELECT confirmed_flush_lsn FROM pg_replication_slots WHERE slot_name = '%s'" % start['slot']), env=clientEnv(config))
+    if output is None:
+        return 'reading replication slot %s failed' % start['slot']
+    if not output.strip():
+        return 'replication slot %s is gone, start a new chain with a full dump' % start['slot']
+    confirmed = output.strip()
+    if parseLsn(confirmed) > parseLsn(start['lsn']):
+        # The increment the slot was moved past is gone, its changes would be missing from this one
+        return 'replication slot %s is at %s, past the end of the chain at %s, start a new chain with a full dump' % (start['slot'], confirmed, start['lsn'])
+    if parseLsn(confirmed) < parseLsn(start['lsn']) and not advanceSlot(config, start):
+        # Moving the slot after the last increment failed, the changes up to the end of the chain are in that increment
+        return 'advancing replication slot %s to the end of the chain failed' % start['slot']
+    return None
+
+def mysqlBinlogRange(config, start):
+    status = readCommand(mysqlQueryCommand(config, 'SHOW MASTER STATUS'), env=clientEnv(config))
+    logs = readCommand(mysqlQueryCommand(config, 'SHOW BINARY LOGS'), env=clientEnv(config))
+    if not status or logs is None:
+        return None, None, 'the binary log is not enabled or the user may not read it'
+    end_file, end_position = status.split('\t')[:2]
+    files = [line.split('\t')[0] for line in logs.splitlines()]
+    if start['file'] not in files:
+        return None, None, "binlog '%s' the chain continues from has been purged, start a new chain with a full dump" % start['file']
+    if end_file not in files:
+        # The server rotated and purged its logs between the two queries
+        return None, None, "binlog '%s' the server writes to is not among its binary logs, try again" % end_file
+    return files[files.index(start['file']):files.index(end_file) + 1], {'file': end_file, 'position': int(end_position)}, None
+
+def unescapeCopy(value):
+    return COPY_ESCAPE.sub(lambda match: COPY_ESCAPES.get(match.group(1), match.group(1)), value)
+
+def sqlValue(value):
+    if value == 'null':
+        return 'NULL'
+    if value.startswith("'") or PLAIN_VALUE.fullmatch(value):
+        return value
+    # NaN, Infinity and other unquoted output of a type
+    return "'%s'" % value.replace("'", "''")
+
+def columnValues(text):
+    return [(match.group(1), match.group(3)) for match in TEST_DECODING_COLUMN.finditer(text)]
+
+def condition(columns):
+    return ' AND '.join('%s IS NULL' % name if value == 'null' else '%s = %s' % (name, sqlValue(value)) for name, value in columns)
+
+
+class ChangesWriter:
+    # Turns the rows of pg_logical_slot_peek_changes with the test_decoding plugin into SQL statements
+
+    def __init__(self, output, primary_keys):
+        self.output = output
+        self.primary_keys = primary_keys
+        self.pending = b''
+        self.changes = 0
+        self.skipped = 0
+
+    def write(self, data):
+        lines = (self.pending + data).split(b'\n')
+        self.pending = lines.pop()
+        for line in lines:
+            statement = self.statement(unescapeCopy(line.decode('utf-8')))
+            if statement:
+                self.output.write((statement + '\n').encode('utf-8'))
+
+    def statement(self, line):
+        if line.startswith('BEGIN'):
+            return 'BEGIN;'
+        if line.startswith('COMMIT'):
+            return 'COMMIT;'
+        match = TEST_DECODING_CHANGE.match(line)
+        if not match:
+            return None
+        table, action, data = match.groups()
+        self.changes += 1
+        if action == 'TRUNCATE':
+            options = (' RESTART IDENTITY' if 'restart_seqs' in data else '') + (' CASCADE' if 'cascade' in data else '')
+            return 'TRUNCATE %s%s;' % (table, options)
+        if action == 'INSERT':
+            columns = columnValues(data)
+            # The slot is created just before the full dump, changes the dump already holds come again
+            return 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT DO NOTHING;' % (table, ', '.join(name for name, _ in columns), ', '.join(sqlValue(value) for _, value in columns))
+        if action == 'DELETE':
+            key = columnValues(data)
+            if not key:
+                # Without a primary key or replica identity the deleted row can not be told apart
+                self.skipped += 1
+                return None
+            return 'DELETE FROM %s WHERE %s;' % (table, condition(key))
+        if data.startswith('old-key: '):
+            old, new = data[len('old-key: '):].split(' new-tuple: ', 1)
+            key = columnValues(old)
+            columns = columnValues(new)
+        else:
+            columns = columnValues(data)
+            key_names = self.primary_keys.get(table, [])
+            key = [(name, value) for name, value in columns if name in key_names]
+        if not key:
+            self.skipped += 1
+            return None
+        assignments = ', '.join('%s = %s' % (name, sqlValue(value)) for name, value in columns if value != UNCHANGED_TOAST)
+        return 'UPDATE %s SET %s WHERE %s;' % (table, assignments, condition(key))
+
+
+def pgPrimaryKeys(config):
+    output = readCommand(pgQueryCommand(config, PG_PRIMARY_KEYS_QUERY), env=clientEnv(config))
+    if output is None:
+        return None
+    keys = {}
+    for line in output.splitlines():
+        primary_key = json.loads(line)
+        keys[primary_key['table']] = primary_key['columns']
+    return keys
+
+def pgChanges(config, start, changes_file, progress=None):
+    # Peeked up to the flushed position, the slot only moves on once the increment is safely written and can not be
+    # moved further than what is flushed
+    end = readCommand(pgQueryCommand(config, 'SELECT pg_current_wal_flush_lsn()'), env=clientEnv(config))
+    primary_keys = pgPrimaryKeys(config)
+    if not end or primary_keys is None:
+        return None, None
+    end = end.strip()
+    query = "COPY (SELECT data FROM pg_logical_slot_peek_changes('%s', '%s', NULL)) TO STDOUT" % (start['slot'], end)
+    with open(changes_file, 'wb') as output:
+        writer = ChangesWriter(output, primary_keys)
+        if not runPipeline([pgQueryCommand(config, query)], stdout=writer, env=clientEnv(config), progress=progress):
+            return None, None
+        # Sequences are not decoded, their values are set to where they are now
+        sequences = readCommand(pgQueryCommand(config, PG_SEQUENCES_QUERY), env=clientEnv(config)) or ''
+        for sequence in sequences.splitlines():
+            output.write(('SELECT pg_catalog.setval(%s, true);\n' % sequence).encode('utf-8'))
+    return {'slot': start['slot'], 'lsn': end}, writer
+
+def advanceSlot(config, position):
+    return readCommand(pgQueryCommand(config, "SELECT pg_replication_slot_advance('%s', '%s')" % (position['slot'], position['lsn'])), env=clientEnv(config)) is not None
+
+def dumpIncrement(config, start, dump_location, checksum=None, progress=None):
+    # Returns the position the increment ends at and the number of changes it had to leave out, or an error
+    write = dumpToChunks if config.storage == 'dedup' else dumpToFile
+    if config.databaseType == 'mysql':
+        files, end, error = mysqlBinlogRange(config, start)
+        if error:
+            return None, 0, error
+        if not write(config, mysqlBinlogCommand(config, files, start['position'], end['position']), dump_location, checksum, progress):
+            return None, 0, 'mysqlbinlog failed'
+        return end, 0, None
+    # The changes are turned into SQL first, compressing or chunking them streams from the file like any other dump
+    error = slotError(config, start)
+    if error:
+        return None, 0, error
+    changes_file = os.path.join(os.path.dirname(os.path.abspath(dump_location)), '.%s.changes' % os.path.basename(dump_location))
+    try:
+        end, writer = pgChanges(config, start, changes_file)
+        if end is None:
+            return None, 0, 'reading the changes of replication slot %s failed' % start['slot']
+        if not write(config, 'cat "%s"' % changes_file, dump_location, checksum, progress):
+            return None, 0, 'writing the changes failed'
+        return end, writer.skipped, None
+    finally:
+        if os.path.exists(changes_file):
+            os.remove(changes_file)
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
-from actions import loadConfig, logError, showConfig, showMenu
-from constants import BColors
+import sys
+
+from cli import buildParser, runCommand
 
 
 def main():
+    from actions import loadConfig, logError, showMenu
+
     while True:
         config = loadConfig()
         if not config:
@@ -18,4 +21,7 @@ def main():
             break
 
 if __name__ == '__main__':
+    arguments = buildParser().parse_args()
+    if arguments.command:
+        sys.exit(runCommand(arguments))
     main()
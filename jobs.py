@@ -0,0 +1,179 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+JOBS_FILE = '.jdump_jobs.json'
+WORKER_LOG_FILE = '.jdump_worker.log'
+JOBS_VERSION = 1
+JOB_TYPES = ['dump', 'restore', 'clean']
+FINISHED_STATUSES = ['done', 'failed', 'cancelled']
+KEEP_FINISHED_JOBS = 50
+CANCEL_TIMEOUT = 10
+
+
+def processAlive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def killProcessGroup(pid):
+    # Every job runs in its own session, its process group holds the job and every client it started
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.time() + CANCEL_TIMEOUT
+    while processAlive(pid) and time.time() < deadline:
+        time.sleep(0.1)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class JobStore:
+
+    def __init__(self, folder, script):
+        self.folder = folder
+        self.path = os.path.join(folder, JOBS_FILE)
+        # The jdump.py the worker and the jobs are started with
+        self.script = script
+
+    @contextmanager
+    def lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            if state.get('version') == JOBS_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'version': JOBS_VERSION, 'worker': None, 'nextId': 1, 'jobs': []}
+
+    def write(self, state):
+        finished = [job for job in state['jobs'] if job['status'] in FINISHED_STATUSES]
+        for job in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            state['jobs'].remove(job)
+        fd, tmp_path = tempfile.mkstemp(prefix=JOBS_FILE, dir=self.folder)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, indent=1)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @contextmanager
+    def update(self):
+        with self.lock():
+            state = self.read()
+            yield state
+            self.write(state)
+
+    def jobs(self):
+        with self.update() as state:
+            for job in state['jobs']:
+                # A job whose process is gone without reporting back was killed with its worker
+                if job['status'] == 'running' and not processAlive(job.get('pid')):
+                    job.update({'status': 'failed', 'finished': time.time(), 'error': 'The job process stopped unexpectedly'})
+            return state['jobs']
+
+    def job(self, job_id):
+        for job in self.read()['jobs']:
+            if job['id'] == job_id:
+                return job
+        return None
+
+    def updateJob(self, job_id, **values):
+        with self.update() as state:
+            for job in state['jobs']:
+                if job['id'] == job_id:
+                    job.update(values)
+
+    def submit(self, job_type, config_id, **arguments):
+        with self.update() as state:
+            job = {
+                'id': state['nextId'],
+                'type': job_type,
+                'config': config_id,
+                'arguments': arguments,
+                'status': 'queued',
+                'created': time.time(),
+                'started': None,
+                'finished': None,
+                'pid': None,
+                'bytes': 0,
+                'total': None,
+                'dumpLocation': None,
+                'error': None
+            }
+            state['nextId'] += 1
+            state['jobs'].append(job)
+            # The worker clears its pid under the same lock when it runs out of jobs, so a job is never left behind
+            if not processAlive(state['worker']):
+                state['worker'] = self.startWorker()
+        return job
+
+    def startWorker(self):
+        with open(os.path.join(self.folder, WORKER_LOG_FILE), 'a') as log:
+            process = subprocess.Popen([sys.executable, self.script, 'jobs', 'worker'], start_new_session=True,
+                                       stdin=subprocess.DEVNULL, stdout=log, stderr=log)
+        return process.pid
+
+    def runWorker(self):
+        while True:
+            with self.update() as state:
+                job = next((job for job in state['jobs'] if job['status'] == 'queued'), None)
+                if job is None:
+                    state['worker'] = None
+                    return
+                # Started under the lock, a cancel always sees the process of a running job
+                process = subprocess.Popen([sys.executable, self.script, 'jobs', 'run', '--id', str(job['id'])], start_new_session=True)
+                job.update({'status': 'running', 'started': time.time(), 'pid': process.pid})
+            return_code = process.wait()
+            with self.update() as state:
+                for finished_job in state['jobs']:
+                    if finished_job['id'] == job['id'] and finished_job['status'] == 'running':
+                        finished_job.update({'status': 'done' if return_code == 0 else 'failed', 'finished': time.time()})
+
+    def cancel(self, job_id, cleanup=None):
+        with self.update() as state:
+            job = next((job for job in state['jobs'] if job['id'] == job_id), None)
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return None
+            was_running = job['status'] == 'running'
+            job.update({'status': 'cancelled', 'finished': time.time()})
+        if was_running:
+            killProcessGroup(job['pid'])
+            # The job may have written its dump location after the state was read
+            job = self.job(job_id) or job
+            if cleanup:
+                cleanup(job)
+        return job
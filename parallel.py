@@ -0,0 +1,119 @@
+import json
+import os
+import re
+
+from checkpoints import OBJECTS_STEP, tableStep
+from commands import (COMPRESSION_EXTENSIONS, MANIFEST_FILE, clientEnv,
+                      dumpJobs, mysqlDumpTablesCommand, mysqlQueryCommand)
+from history import currentOperation, withinOperation
+from pipeline import dumpToFile, readCommand, restoreFromFile
+
+TABLES_QUERY = 'SELECT table_name, table_type, COALESCE(data_length + index_length, 0) FROM information_schema.tables WHERE table_schema = DATABASE()'
+OBJECTS_FILE = '_objects'
+TABLE_DUMP_OPTIONS = ' --single-transaction'
+
+
+def listTables(config):
+    output = readCommand(mysqlQueryCommand(config, TABLES_QUERY), env=clientEnv(config))
+    if output is None:
+        return None
+    tables = []
+    for line in output.splitlines():
+        name, table_type, size = line.split('\t')
+        tables.append({
+            'name': name,
+            'type': table_type,
+            'size': int(size)
+        })
+    return tables
+
+def tableFileName(index, table, config):
+    extension = '.sql' + COMPRESSION_EXTENSIONS.get(config.compression, '')
+    return '%04d_%s%s' % (index, re.sub(r'[^\w.-]', '_', table), extension)
+
+def runLargestFirst(jobs, workers, function):
+    from concurrent.futures import ThreadPoolExecutor
+    # The pool takes work in submission order, so the biggest tables start first and no huge table is left for the end
+    jobs = sorted(jobs, key=lambda job: job['size'], reverse=True)
+    results = []
+    operation = currentOperation()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(job, executor.submit(withinOperation, operation, function, job)) for job in jobs]
+        for index, (job, future) in enumerate(futures):
+            success = future.result()
+            print("[%d/%d] %s %s" % (index + 1, len(futures), job['name'], 'done' if success else 'FAILED'))
+            results.append(success)
+    return all(results)
+
+def dumpTables(config, dump_location, progress=None, jobs_count=None):
+    tables = listTables(config)
+    if tables is None:
+        return False
+    os.makedirs(dump_location)
+    base_tables = [table for table in tables if table['type'] == 'BASE TABLE']
+    views = [table['name'] for table in tables if table['type'] == 'VIEW']
+    jobs = []
+    for index, table in enumerate(base_tables):
+        jobs.append({
+            'name': table['name'],
+            'file': tableFileName(index, table['name'], config),
+            'size': table['size']
+        })
+    # Every table is read in a transaction of its own, InnoDB tables are consistent in themselves but not with each other
+    success = runLargestFirst(jobs, jobs_count or dumpJobs(config), lambda job: dumpToFile(config, mysqlDumpTablesCommand(config, [job['name']], TABLE_DUMP_OPTIONS), os.path.join(dump_location, job['file']), progress=progress))
+    # Views and routines depend on the tables, they are dumped once and restored after all tables
+    objects_file = tableFileName(len(base_tables), OBJECTS_FILE, config)
+    if views:
+        objects_command = mysqlDumpTablesCommand(config, views, ' --routines --events --skip-triggers')
+    else:
+        objects_command = mysqlDumpTablesCommand(config, [], ' --routines --events --skip-triggers --no-create-info --no-data')
+    success = success and dumpToFile(config, objects_command, os.path.join(dump_location, objects_file), progress=progress)
+    manifest = {
+        'database': config.database,
+        'databaseType': config.databaseType,
+        'tables': [{'name': job['name'], 'file': job['file'], 'size': job['size']} for job in jobs],
+        'objects': objects_file
+    }
+    with open(os.path.join(dump_location, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return success
+
+def readTablesManifest(dump_location):
+    with open(os.path.join(dump_location, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+def restoreTables(config, dump_location, progress=None, fast=False, tables=None, jobs_count=None, checkpoint=None):
+    manifest = readTablesManifest(dump_location)
+    jobs = []
+    for table in manifest['tables']:
+        if tables is not None and table['name'] not in tables:
+            continue
+        if checkpoint is not None and checkpoint.isDone(tableStep(table['name'])):
+            continue
+        dump_file = os.path.join(dump_location, table['file'])
+        jobs.append({
+            'name': table['name'],
+            'file': dump_file,
+            'size': os.path.getsize(dump_file)
+        })
+    success = runLargestFirst(jobs, jobs_count or dumpJobs(config), lambda job: restoreStep(config, tableStep(job['name']), job['file'], progress, fast, checkpoint))
+    if tables is not None:
+        # Views and routines may use tables that are not restored
+        return success
+    return success and restoreStep(config, OBJECTS_STEP, os.path.join(dump_location, manifest['objects']), progress, fast, checkpoint)
+
+def restoreStep(config, step, dump_file, progress=None, fast=False, checkpoint=None):
+    # Every table file drops and creates its table, a table that was cut off is restored again as a whole
+    if checkpoint is not None and checkpoint.isDone(step):
+        return True
+    success = restoreFromFile(config, dump_file, progress, fast)
+    if success and checkpoint is not None:
+        checkpoint.complete(step)
+    return success
+
+def remainingTablesSize(dump_location, done):
+    manifest = readTablesManifest(dump_location)
+    files = [table['file'] for table in manifest['tables'] if tableStep(table['name']) not in done]
+    if OBJECTS_STEP not in done:
+        files.append(manifest['objects'])
+    return sum(os.path.getsize(os.path.join(dump_location, file)) for file in files)
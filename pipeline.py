@@ -0,0 +1,115 @@
+import os
+import subprocess
+import threading
+import time
+
+from chunks import ChunkReader, ChunkWriter, compressionLevel
+from commands import (clientEnv, compressCommand, decompressCommand,
+                      dumpFormatOf, fastRestoreInputCommand, restoreCommand)
+from history import recordCommands
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def pump(source, target, observers):
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        for observer in observers:
+            observer(chunk)
+        target.write(chunk)
+
+def pumpInput(source, process_stdin, observers):
+    try:
+        pump(source, process_stdin, observers)
+    except BrokenPipeError:
+        # The process stopped reading, its exit code tells what went wrong
+        pass
+    finally:
+        try:
+            process_stdin.close()
+        except BrokenPipeError:
+            pass
+
+def runPipeline(commands, stdin=None, stdout=None, env=None, checksum=None, progress=None):
+    # Chains the shell commands like 'a | b | c', every stage streams into the next one, nothing touches the disk in between
+    processes = []
+    started = time.time()
+    streamed = [0]
+    # When jdump follows the progress it counts the bytes read from stdin, without stdin the bytes written to stdout.
+    # Streams that are not files, like the chunk store, always pass through here.
+    pump_input = stdin is not None and (progress is not None or not hasattr(stdin, 'fileno'))
+    pump_output = stdout is not None and (checksum is not None or (progress is not None and not pump_input) or not hasattr(stdout, 'fileno'))
+    previous = subprocess.PIPE if pump_input else stdin
+    for index, command in enumerate(commands):
+        is_last = index == len(commands) - 1
+        process_stdout = stdout if is_last and not pump_output else subprocess.PIPE
+        process = subprocess.Popen(command, shell=True, stdin=previous, stdout=process_stdout, env=env)
+        if processes:
+            # Only the next stage should hold the read end, otherwise an early exit would never signal the writer
+            processes[-1].stdout.close()
+        processes.append(process)
+        previous = process.stdout
+    input_thread = None
+    if pump_input:
+        observers = [lambda chunk: streamed.__setitem__(0, streamed[0] + len(chunk))]
+        if progress is not None:
+            observers.append(lambda chunk: progress.update(len(chunk)))
+        input_thread = threading.Thread(target=pumpInput, args=(stdin, processes[0].stdin, observers), daemon=True)
+        input_thread.start()
+    if pump_output:
+        # The output passes through here so it can be hashed and counted while it is written
+        observers = [] if pump_input else [lambda chunk: streamed.__setitem__(0, streamed[0] + len(chunk))]
+        if checksum is not None:
+            observers.append(checksum.update)
+        if progress is not None and not pump_input:
+            observers.append(lambda chunk: progress.update(len(chunk)))
+        pump(previous, stdout, observers)
+        previous.close()
+    return_codes = [process.wait() for process in processes]
+    if input_thread:
+        input_thread.join()
+    # Bytes are only known when they passed through jdump
+    recordCommands(commands, started, return_codes, streamed[0] if pump_input or pump_output else None)
+    return all(code == 0 for code in return_codes)
+
+def readCommand(command, env=None):
+    started = time.time()
+    result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, env=env)
+    recordCommands([command], started, [result.returncode], len(result.stdout))
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode('utf-8')
+
+def runWithInput(command, data, env=None):
+    started = time.time()
+    return_code = subprocess.run(command, shell=True, input=data, env=env).returncode
+    recordCommands([command], started, [return_code], len(data))
+    return return_code == 0
+
+def dumpToFile(config, command, dump_file, checksum=None, progress=None):
+    commands = [command]
+    compress_command = compressCommand(config)
+    if compress_command:
+        commands.append(compress_command)
+    with open(dump_file, 'wb') as output:
+        return runPipeline(commands, stdout=output, env=clientEnv(config), checksum=checksum, progress=progress)
+
+def dumpToChunks(config, command, manifest_file, checksum=None, progress=None):
+    # The chunks are compressed one by one, a compressed stream would hide the content the chunks are shared on
+    writer = ChunkWriter(os.path.dirname(os.path.abspath(manifest_file)), compressionLevel(config))
+    if not runPipeline([command], stdout=writer, env=clientEnv(config), checksum=checksum, progress=progress):
+        # Chunks written so far stay in the store until they are collected
+        return False
+    writer.close(manifest_file)
+    return True
+
+def restoreFromFile(config, dump_file, progress=None, fast=False):
+    commands = [restoreCommand(config, fast)]
+    input_command = decompressCommand(dump_file)
+    if fast:
+        input_command = fastRestoreInputCommand(config, input_command)
+    if input_command:
+        commands.insert(0, input_command)
+    if dumpFormatOf(dump_file) == 'dedup':
+        return runPipeline(commands, stdin=ChunkReader(dump_file), env=clientEnv(config), progress=progress)
+    with open(dump_file, 'rb') as input:
+        return runPipeline(commands, stdin=input, env=clientEnv(config), progress=progress)
@@ -0,0 +1,64 @@
+import sys
+import threading
+import time
+
+from formatting import formatDuration, formatSize
+
+RENDER_INTERVAL = 0.5
+
+
+class Progress:
+
+    # Called with the progress every render interval, a background job uses it to publish its progress
+    reporter = None
+
+    def __init__(self, label, total=None, stream=sys.stderr, live=None):
+        self.label = label
+        self.total = total
+        self.stream = stream
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.rendered = 0
+        self.lock = threading.Lock()
+        # Rewriting the same line only makes sense on a terminal, cron output only gets the summary
+        self.live = stream.isatty() if live is None else live
+
+    def update(self, count):
+        # Called once per streamed chunk, rendering is throttled so it never slows the stream down
+        with self.lock:
+            self.bytes += count
+            now = time.monotonic()
+            if now - self.rendered >= RENDER_INTERVAL:
+                self.rendered = now
+                if self.live:
+                    self.render(now)
+                if Progress.reporter:
+                    Progress.reporter(self)
+
+    def elapsed(self, now=None):
+        return (now or time.monotonic()) - self.started
+
+    def throughput(self, now=None):
+        elapsed = self.elapsed(now)
+        return self.bytes / elapsed if elapsed > 0 else 0
+
+    def render(self, now):
+        throughput = self.throughput(now)
+        line = '%s: %s' % (self.label, formatSize(self.bytes))
+        if self.total:
+            line += ' of %s (%d%%)' % (formatSize(self.total), min(100, self.bytes * 100 // self.total))
+        line += ', %s/s, elapsed %s' % (formatSize(throughput), formatDuration(self.elapsed(now)))
+        if self.total and throughput > 0:
+            line += ', ETA %s' % formatDuration(max(0, self.total - self.bytes) / throughput)
+        self.stream.write('\r' + line.ljust(100))
+        self.stream.flush()
+
+    def finish(self, success=True, total_bytes=None):
+        if total_bytes is not None:
+            self.bytes = total_bytes
+        if Progress.reporter:
+            Progress.reporter(self)
+        if self.live:
+            self.stream.write('\r' + ' ' * 100 + '\r')
+        self.stream.write('%s %s: %s in %s (%s/s)\n' % (self.label, 'finished' if success else 'failed', formatSize(self.bytes), formatDuration(self.elapsed()), formatSize(self.throughput())))
+        self.stream.flush()
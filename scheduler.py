@@ -0,0 +1,49 @@
+import threading
+import time
+
+from commands import DEFAULT_PORTS, dockerTransport
+
+
+def hostKey(config):
+    # Host clients always connect to the local server, docker configurations to their container. With the tcp
+    # transport the clients connect to the port the container publishes, the local server may be listening on it.
+    if dockerTransport(config) == 'tcp':
+        return '%s:localhost:%d' % (config.databaseType, int(config.dockerPort or DEFAULT_PORTS[config.databaseType]))
+    if config.isDocker:
+        return 'docker:%s' % config.dockerContainerName
+    return '%s:localhost:%d' % (config.databaseType, DEFAULT_PORTS[config.databaseType])
+
+def isSameServer(config, other):
+    # Configurations of one container reach it with either transport
+    if config.isDocker and other.isDocker and config.dockerContainerName == other.dockerContainerName:
+        return True
+    return hostKey(config) == hostKey(other)
+
+def runPerHost(configs, function, per_host=1, workers=None):
+    from concurrent.futures import ThreadPoolExecutor
+    if per_host < 1:
+        # A semaphore of zero never lets a dump start
+        raise ValueError('per_host must be at least 1, got %r' % per_host)
+    # Every configuration gets a thread, the semaphore of its host decides when it may start
+    host_limits = {}
+    for config in configs:
+        host_limits.setdefault(hostKey(config), threading.Semaphore(per_host))
+
+    def run(config):
+        with host_limits[hostKey(config)]:
+            started = time.time()
+            try:
+                result = function(config)
+            except Exception as e:
+                print("Dumping configuration %s failed: %s" % (config.config_id, e))
+                result = None
+            return {
+                'config': config.config_id,
+                'host': hostKey(config),
+                'result': result,
+                'duration': time.time() - started
+            }
+
+    with ThreadPoolExecutor(max_workers=workers or len(configs) or 1) as executor:
+        futures = [executor.submit(run, config) for config in configs]
+        return [future.result() for future in futures]
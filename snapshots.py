@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from catalog import (forgetOrphanedSnapshots, readOrphanedSnapshots,
+                     refreshCatalog, updateDump)
+from commands import (clientEnv, createDatabaseCommand, dropDatabaseCommand,
+                      mysqlDumpTablesCommand, mysqlQueryCommand,
+                      restoreCommand)
+from pipeline import readCommand, runPipeline, runWithInput
+
+SNAPSHOT_INFIX = '_jdump_'
+
+
+def snapshotName(config, dump_entry):
+    digest = hashlib.sha1(('%s:%s:%s' % (dump_entry['name'], dump_entry['mtime'], dump_entry['size'])).encode('utf-8')).hexdigest()[:10]
+    # Database names are limited to 63 characters in PostgreSQL
+    return config.database[:40] + SNAPSHOT_INFIX + digest
+
+def getSnapshot(config, dump):
+    entry = refreshCatalog(config.dumpFolder).get(dump)
+    if entry is None:
+        return None
+    return entry.get('snapshots', {}).get(str(config.config_id))
+
+def mysqlBaseTables(config, database):
+    output = readCommand(mysqlQueryCommand(config, 'SHOW FULL TABLES IN %s' % database), env=clientEnv(config))
+    if output is None:
+        return None
+    return [line.split('\t')[0] for line in output.splitlines() if line.split('\t')[1] == 'BASE TABLE']
+
+def unsupportedObjects(config):
+    # Events are scheduled by the server, in a snapshot they would run against the snapshot database
+    if config.databaseType != 'mysql':
+        return None
+    output = readCommand(mysqlQueryCommand(config, 'SHOW EVENTS IN %s' % config.database), env=clientEnv(config))
+    if output is None:
+        return 'the events of %s could not be read' % config.database
+    if output.strip():
+        return '%s has events, they would run in the snapshot database' % config.database
+    return None
+
+def mysqlCopySchema(config, source, target, options):
+    # mysqldump leaves out the database name, the statements apply to the database that is used
+    dump_command = "{ printf '%%s\\n' 'USE `%s`;'; %s; }" % (target, mysqlDumpTablesCommand(config, [], options, database=source))
+    return runPipeline([dump_command, restoreCommand(config)], env=clientEnv(config))
+
+def mysqlCloneTables(config, source, target):
+    tables = mysqlBaseTables(config, source)
+    if tables is None:
+        return False
+    # The tables with their keys and foreign keys, the views and the routines first, the triggers only once the rows are
+    # copied so they do not fire for them
+    if not mysqlCopySchema(config, source, target, ' --no-data --skip-triggers --routines --skip-events'):
+        return False
+    statements = ['SET FOREIGN_KEY_CHECKS=0;']
+    for table in tables:
+        statements.append('INSERT INTO `%s`.`%s` SELECT * FROM `%s`.`%s`;' % (target, table, source, table))
+    return runWithInput(restoreCommand(config), '\n'.join(statements).encode('utf-8'), env=clientEnv(config)) \
+        and mysqlCopySchema(config, source, target, ' --no-data --no-create-info --skip-routines --skip-events')
+
+def copyDatabase(config, source, target):
+    runPipeline([dropDatabaseCommand(config, target)], env=clientEnv(config))
+    if config.databaseType == 'postgres':
+        # A template copy duplicates the database files, nothing is replayed
+        return runPipeline([createDatabaseCommand(config, target, template=source)], env=clientEnv(config))
+    return runPipeline([createDatabaseCommand(config, target)], env=clientEnv(config)) \
+        and mysqlCloneTables(config, source, target)
+
+def dropOrphanedSnapshots(config):
+    # Snapshots of dumps that changed or were removed since, only the catalog knows they are there
+    orphaned = [snapshot for snapshot in readOrphanedSnapshots(config.dumpFolder) if snapshot['config'] == str(config.config_id)]
+    dropped = [snapshot['database'] for snapshot in orphaned if runPipeline([dropDatabaseCommand(config, snapshot['database'])], env=clientEnv(config))]
+    if dropped:
+        forgetOrphanedSnapshots(config.dumpFolder, dropped)
+    return dropped
+
+def createSnapshot(config, dump):
+    entry = refreshCatalog(config.dumpFolder).get(dump)
+    if entry is None:
+        return None
+    dropOrphanedSnapshots(config)
+    snapshot = snapshotName(config, entry)
+    if not copyDatabase(config, config.database, snapshot):
+        return None
+    snapshots = dict(entry.get('snapshots', {}))
+    snapshots[str(config.config_id)] = {
+        'database': snapshot,
+        'databaseType': config.databaseType,
+        'created': time.time()
+    }
+    updateDump(config.dumpFolder, dump, snapshots=snapshots)
+    return snapshot
+
+def restoreSnapshot(config, snapshot):
+    return copyDatabase(config, snapshot['database'], config.database)
+
+def removeSnapshot(config, dump):
+    entry = refreshCatalog(config.dumpFolder).get(dump)
+    if entry is None:
+        return False
+    snapshots = dict(entry.get('snapshots', {}))
+    snapshot = snapshots.pop(str(config.config_id), None)
+    if snapshot is None:
+        return False
+    runPipeline([dropDatabaseCommand(config, snapshot['database'])], env=clientEnv(config))
+    updateDump(config.dumpFolder, dump, snapshots=snapshots)
+    return True
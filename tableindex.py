@@ -0,0 +1,312 @@
+import json
+import os
+import re
+import time
+
+from checkpoints import POST_STEP, PRE_STEP, tableStep
+from chunks import ChunkReader
+from commands import (clientEnv, compressionOf, dumpFormatOf, dumpJobs,
+                      fastRestoreInputCommand, pgQueryCommand, restoreCommand)
+from history import recordPhase
+from parallel import runLargestFirst
+from pipeline import CHUNK_SIZE, runPipeline
+
+INDEX_VERSION = 2
+MYSQL_SECTION = re.compile(rb'^-- (Table structure for table|Dumping data for table|Temporary view structure for view|Temporary table structure for view|Final view structure for view) `(.+)`\s*$')
+MYSQL_OBJECTS_SECTION = re.compile(rb'^-- Dumping (routines|events) for database')
+MYSQL_FOOTER = re.compile(rb'^(/\*!40103 SET TIME_ZONE=@OLD_TIME_ZONE \*/;|-- Dump completed)')
+MYSQL_SECTION_TYPES = {
+    b'Table structure for table': 'TABLE',
+    b'Dumping data for table': 'TABLE DATA',
+    b'Temporary view structure for view': 'VIEW',
+    b'Temporary table structure for view': 'VIEW',
+    b'Final view structure for view': 'VIEW'
+}
+PG_SECTION = re.compile(rb'^-- (Data for )?Name: (.+?); Type: (.+?); Schema: (.*?); Owner: .*$')
+PG_FOOTER = re.compile(rb'^-- PostgreSQL database dump complete')
+PG_INDEX_TABLE = re.compile(rb'^CREATE (UNIQUE )?INDEX .* ON (ONLY )?(\S+) ')
+PG_OWNED_BY_TABLE = re.compile(rb'^ALTER SEQUENCE .* OWNED BY (\S+);')
+PG_COPY_TABLE = re.compile(rb'^COPY ((?:"(?:[^"]|"")*"|[^" ])+) ')
+PG_TABLE_TYPES = ['TABLE', 'TABLE DATA', 'VIEW', 'MATERIALIZED VIEW', 'MATERIALIZED VIEW DATA', 'FOREIGN TABLE']
+# The name of these objects starts with the name of their table: 'table constraint'
+PG_TABLE_OBJECT_TYPES = ['CONSTRAINT', 'FK CONSTRAINT', 'DEFAULT', 'TRIGGER', 'RULE', 'POLICY']
+PG_DATA_TYPES = ['TABLE DATA', 'SEQUENCE SET', 'BLOB', 'BLOBS', 'LARGE OBJECT']
+VIEW_TYPES = ['VIEW', 'MATERIALIZED VIEW', 'MATERIALIZED VIEW DATA']
+
+
+def indexPath(dump_file):
+    return os.path.join(os.path.dirname(os.path.abspath(dump_file)), '.%s.jdump_index.json' % os.path.basename(dump_file))
+
+def isIndexable(dump_file):
+    # Ranges are read by seeking, a compressed stream would have to be decompressed from the start for every range
+    return dumpFormatOf(dump_file) == 'dedup' or (dumpFormatOf(dump_file) == 'plain' and compressionOf(dump_file) == 'none')
+
+def openRange(dump_file, start, end):
+    if dumpFormatOf(dump_file) == 'dedup':
+        return ChunkReader(dump_file, start, end)
+    return FileRange(dump_file, start, end)
+
+
+class FileRange:
+
+    def __init__(self, dump_file, start, end):
+        self.file = open(dump_file, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.remaining
+        data = self.file.read(min(size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class RangeReader:
+
+    def __init__(self, dump_file, ranges):
+        self.dump_file = dump_file
+        self.ranges = iter(ranges)
+        self.current = None
+
+    def read(self, size=-1):
+        while True:
+            if self.current is None:
+                next_range = next(self.ranges, None)
+                if next_range is None:
+                    return b''
+                self.current = openRange(self.dump_file, next_range[0], next_range[1])
+            data = self.current.read(size if size > 0 else CHUNK_SIZE)
+            if data:
+                return data
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+
+
+def iterLines(reader):
+    pending = b''
+    for data in iter(lambda: reader.read(CHUNK_SIZE), b''):
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+def pgOwner(section_type, name):
+    if section_type in PG_TABLE_TYPES:
+        return name
+    if section_type in PG_TABLE_OBJECT_TYPES:
+        return name.split(' ')[0]
+    if section_type in ['ACL', 'COMMENT']:
+        if name.startswith('TABLE '):
+            return name[len('TABLE '):]
+        if name.startswith('COLUMN '):
+            return name[len('COLUMN '):].split('.')[0]
+    return None
+
+def unqualified(name):
+    return name.split(b'.')[-1].strip(b'"')
+
+def buildIndex(dump_file):
+    # One pass over the dump, every section between two section comments of mysqldump or pg_dump becomes a byte range
+    database_type = None
+    header_end = None
+    footer_start = None
+    sections = []
+    section = None
+    in_copy = False
+    phase = 'pre'
+    position = 0
+    previous_line = None
+    previous_start = 0
+    reader = ChunkReader(dump_file) if dumpFormatOf(dump_file) == 'dedup' else FileRange(dump_file, 0, os.path.getsize(dump_file))
+    try:
+        for line in iterLines(reader):
+            # A section starts at the '--' line above its comment
+            start = previous_start if previous_line == b'--\n' else position
+            previous_line = line
+            previous_start = position
+            position += len(line)
+            if in_copy:
+                # Data rows of a COPY can contain anything, also lines that look like section comments
+                in_copy = line != b'\\.\n'
+                continue
+            if database_type is None:
+                if line.startswith((b'-- MySQL dump', b'-- MariaDB dump')):
+                    database_type = 'mysql'
+                elif line.startswith(b'-- PostgreSQL database dump'):
+                    database_type = 'postgres'
+            if database_type == 'postgres':
+                if line.startswith(b'COPY ') and line.rstrip().endswith(b'FROM stdin;'):
+                    in_copy = True
+                    match = PG_COPY_TABLE.match(line)
+                    if section is not None and match:
+                        section.setdefault('copies', []).append(match.group(1).decode('utf-8'))
+                    continue
+                match = PG_SECTION.match(line)
+                if match:
+                    section_type = match.group(3).decode('utf-8')
+                    if section_type in PG_DATA_TYPES:
+                        phase = 'data'
+                    elif phase == 'data':
+                        phase = 'post'
+                    section = {
+                        'type': section_type,
+                        'owner': pgOwner(section_type, match.group(2).decode('utf-8')),
+                        'phase': phase,
+                        'start': start
+                    }
+                    sections.append(section)
+                    # Subset dumps are several dumps in a row, the footer of one becomes part of the section before it
+                    footer_start = None
+                elif PG_FOOTER.match(line) and footer_start is None:
+                    footer_start = start
+                elif section is not None and section['owner'] is None and section['type'] in ['INDEX', 'SEQUENCE OWNED BY']:
+                    # The table of an index or sequence is only named in its statement
+                    match = PG_INDEX_TABLE.match(line) if section['type'] == 'INDEX' else PG_OWNED_BY_TABLE.match(line)
+                    if match:
+                        target = match.group(match.lastindex)
+                        if section['type'] == 'SEQUENCE OWNED BY':
+                            target = target.rsplit(b'.', 1)[0]
+                        section['owner'] = unqualified(target).decode('utf-8')
+            elif database_type == 'mysql':
+                match = MYSQL_SECTION.match(line)
+                if match:
+                    section_type = MYSQL_SECTION_TYPES[match.group(1)]
+                    is_view = section_type == 'VIEW'
+                    section = {
+                        'type': section_type,
+                        'owner': None if is_view else match.group(2).decode('utf-8'),
+                        # Views can only be created once all tables exist
+                        'phase': 'post' if is_view else 'data',
+                        'start': start
+                    }
+                    sections.append(section)
+                    footer_start = None
+                elif MYSQL_OBJECTS_SECTION.match(line):
+                    section = {
+                        'type': 'ROUTINES' if b'routines' in line else 'EVENTS',
+                        'owner': None,
+                        'phase': 'post',
+                        'start': start
+                    }
+                    sections.append(section)
+                    footer_start = None
+                elif MYSQL_FOOTER.match(line) and footer_start is None:
+                    footer_start = start
+            if sections and header_end is None:
+                header_end = sections[0]['start']
+    finally:
+        reader.close()
+    if footer_start is None:
+        footer_start = position
+    if header_end is None:
+        header_end = footer_start
+    for index, section in enumerate(sections):
+        section['end'] = sections[index + 1]['start'] if index + 1 < len(sections) else footer_start
+    tables = {}
+    for section in sections:
+        if section['owner'] is not None and section['type'] not in VIEW_TYPES:
+            tables[section['owner']] = tables.get(section['owner'], 0) + section['end'] - section['start']
+    stat = os.stat(dump_file)
+    return {
+        'version': INDEX_VERSION,
+        'dumpSize': stat.st_size,
+        'dumpMtime': stat.st_mtime,
+        'databaseType': database_type,
+        'header': [0, header_end],
+        'footer': [footer_start, position],
+        'sections': sections,
+        'tables': [{'name': name, 'size': size} for name, size in tables.items()]
+    }
+
+def loadIndex(dump_file):
+    path = indexPath(dump_file)
+    stat = os.stat(dump_file)
+    try:
+        with open(path, 'r') as f:
+            index = json.load(f)
+        # The index is only valid for the dump it was built from
+        if index.get('version') == INDEX_VERSION and index['dumpSize'] == stat.st_size and index['dumpMtime'] == stat.st_mtime:
+            return index
+    except (OSError, ValueError):
+        pass
+    started = time.time()
+    index = buildIndex(dump_file)
+    recordPhase('index', started, True, index['footer'][1])
+    try:
+        with open(path, 'w') as f:
+            json.dump(index, f)
+    except OSError:
+        pass
+    return index
+
+def removeIndex(dump_file):
+    if os.path.exists(indexPath(dump_file)):
+        os.remove(indexPath(dump_file))
+
+def rangesSize(ranges):
+    return sum(end - start for start, end in ranges)
+
+def selectedSections(index, tables=None):
+    if tables is None:
+        return index['sections']
+    # Objects of no table are restored too, except views, they may use tables that are not restored
+    return [section for section in index['sections']
+            if section['owner'] in tables or (section['owner'] is None and section['type'] not in VIEW_TYPES)]
+
+def restorePlan(index, tables=None):
+    sections = selectedSections(index, tables)
+    frame = [index['header']], [index['footer']]
+    pre = [[section['start'], section['end']] for section in sections if section['phase'] == 'pre']
+    post = [[section['start'], section['end']] for section in sections if section['phase'] == 'post']
+    jobs = {}
+    copies = {}
+    for section in sections:
+        if section['phase'] == 'data':
+            jobs.setdefault(section['owner'] or '', []).append([section['start'], section['end']])
+            copies.setdefault(section['owner'] or '', []).extend(section.get('copies', []))
+    data = [{'name': name or 'other data', 'ranges': ranges, 'size': rangesSize(ranges), 'copies': copies[name]} for name, ranges in jobs.items()]
+    return frame, pre, data, post
+
+def restoreSize(index, tables=None, jobs=1, done=()):
+    (header, footer), pre, data, post = restorePlan(index, tables)
+    sessions = [ranges for step, ranges in [(PRE_STEP, pre), (POST_STEP, post)] if ranges and step not in done]
+    sessions.extend(job['ranges'] for job in data if tableStep(job['name']) not in done)
+    return rangesSize(header + footer) * len(sessions) + sum(rangesSize(ranges) for ranges in sessions)
+
+def restoreRanges(config, dump_file, index, tables=None, jobs=None, progress=None, fast=False, checkpoint=None):
+    (header, footer), pre, data, post = restorePlan(index, tables)
+
+    def restoreSession(step, ranges):
+        if not ranges or (checkpoint is not None and checkpoint.isDone(step)):
+            return True
+        commands = [restoreCommand(config, fast)]
+        if fast and fastRestoreInputCommand(config, None):
+            commands.insert(0, fastRestoreInputCommand(config, None))
+        # Every session replays the header and footer of the dump, they hold the session settings the sections rely on
+        success = runPipeline(commands, stdin=RangeReader(dump_file, header + ranges + footer), env=clientEnv(config), progress=progress)
+        if success and checkpoint is not None:
+            checkpoint.complete(step)
+        return success
+
+    def emptyTables(job):
+        # A COPY of an interrupted restore may have committed before its step was recorded, its rows would load twice
+        if checkpoint is None or not checkpoint.resumed or not job['copies']:
+            return True
+        return runPipeline([pgQueryCommand(config, 'TRUNCATE %s' % ', '.join(job['copies']))], env=clientEnv(config))
+
+    # Objects the tables need come first, the tables load concurrently, objects on top of the tables come last
+    if checkpoint is not None:
+        data = [job for job in data if not checkpoint.isDone(tableStep(job['name']))]
+    success = restoreSession(PRE_STEP, pre)
+    success = success and runLargestFirst(data, jobs or dumpJobs(config), lambda job: emptyTables(job) and restoreSession(tableStep(job['name']), job['ranges']))
+    return success and restoreSession(POST_STEP, post)
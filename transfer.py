@@ -0,0 +1,100 @@
+import queue
+
+from commands import (COMPRESSION_EXTENSIONS, clientEnv, compressCommand,
+                      copyDumpCommand, fastRestoreInputCommand,
+                      restoreCommand)
+from history import currentOperation, withinOperation
+from pipeline import runPipeline
+
+# Chunks of pipeline.CHUNK_SIZE held between the dump and each of its readers
+COPY_BUFFER_CHUNKS = 8
+
+
+class BoundedStream:
+    # Hands the chunks one thread writes to a reader on another thread. Only a few chunks are held, a slow reader
+    # blocks the writer and with it the dump, instead of the dump filling the memory.
+
+    def __init__(self, max_chunks=COPY_BUFFER_CHUNKS):
+        self.chunks = queue.Queue(max_chunks)
+        self.abandoned = False
+        self.ended = False
+
+    def write(self, data):
+        if not self.abandoned:
+            self.chunks.put(data)
+
+    def close(self):
+        if not self.abandoned:
+            self.chunks.put(None)
+
+    def read(self, size=-1):
+        if self.ended:
+            return b''
+        data = self.chunks.get()
+        if data is None:
+            self.ended = True
+            return b''
+        return data
+
+    def abandon(self):
+        # The reader stopped, the writer may be waiting for room that would never come
+        self.abandoned = True
+        while True:
+            try:
+                self.chunks.get_nowait()
+            except queue.Empty:
+                return
+
+
+class StreamsWriter:
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def write(self, data):
+        for stream in self.streams:
+            stream.write(data)
+
+
+def copyCompression(config):
+    # The dump a copy keeps is compressed, also for configurations that do not compress their dumps
+    return config.compression if config.compression != 'none' else 'gzip'
+
+def copyExtension(config):
+    return '.sql' + COMPRESSION_EXTENSIONS[copyCompression(config)]
+
+def restoreStream(config, stream, progress=None):
+    commands = [restoreCommand(config, config.fastRestore)]
+    if config.fastRestore and fastRestoreInputCommand(config, None):
+        commands.insert(0, fastRestoreInputCommand(config, None))
+    return runPipeline(commands, stdin=stream, env=clientEnv(config), progress=progress)
+
+def keepStream(config, stream, dump_location, checksum=None):
+    with open(dump_location, 'wb') as output:
+        return runPipeline([compressCommand(config, copyCompression(config))], stdin=stream, stdout=output, checksum=checksum)
+
+def readStream(stream, function, *arguments):
+    try:
+        return function(stream, *arguments)
+    finally:
+        stream.abandon()
+
+def copyDatabase(source, target, dump_location=None, checksum=None, progress=None):
+    # The dump of the source streams straight into the client of the target, and into a compressed dump when it is kept.
+    # Returns whether the copy and whether keeping the dump worked.
+    from concurrent.futures import ThreadPoolExecutor
+    restore_stream = BoundedStream()
+    keep_stream = BoundedStream() if dump_location else None
+    streams = [stream for stream in [restore_stream, keep_stream] if stream is not None]
+    operation = currentOperation()
+    with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+        restored = executor.submit(withinOperation, operation, readStream, restore_stream, lambda stream: restoreStream(target, stream, progress))
+        kept = keep_stream and executor.submit(withinOperation, operation, readStream, keep_stream, lambda stream: keepStream(source, stream, dump_location, checksum))
+        try:
+            dumped = runPipeline([copyDumpCommand(source)], stdout=StreamsWriter(streams), env=clientEnv(source))
+        finally:
+            # An incomplete dump ends the streams as well, the target may take it for a whole one but the copy fails
+            for stream in streams:
+                stream.close()
+        copied = restored.result() and dumped
+        return copied, copied and (not kept or kept.result())